@@ -0,0 +1,78 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+"""
+Compares utils.transfer.fetch_ranges over 1 and N connections against a
+local fake media session that serves GetFile ranges with a fixed round
+trip and a per-connection bandwidth cap, the way a single Telegram media
+connection behaves.
+
+    python -m bench.download_bench --size-mb 256 --connections 1 2 4 8
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.transfer import fetch_ranges
+
+
+class Range:
+    def __init__(self, offset, limit):
+        self.offset = offset
+        self.limit = limit
+
+
+class Chunk:
+    def __init__(self, data):
+        self.bytes = data
+
+
+class FakeSession:
+    def __init__(self, blob, rtt, mbps):
+        self.blob = blob
+        self.rtt = rtt
+        self.bps = mbps * 1024 * 1024
+
+    async def invoke(self, r):
+        data = self.blob[r.offset:r.offset + r.limit]
+        await asyncio.sleep(self.rtt + len(data) / self.bps)
+        return Chunk(data)
+
+
+async def run(blob, n, rtt, mbps, path):
+    sessions = [FakeSession(blob, rtt, mbps) for _ in range(n)]
+    st = time.perf_counter()
+    await fetch_ranges(sessions, Range, len(blob), path)
+    elapsed = time.perf_counter() - st
+    with open(path, 'rb') as f:
+        assert f.read() == blob, "downloaded file differs from the source"
+    return elapsed
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--size-mb', type=int, default=128)
+    ap.add_argument('--connections', type=int, nargs='+', default=[1, 2, 4, 8])
+    ap.add_argument('--rtt-ms', type=float, default=60)
+    ap.add_argument('--mbps', type=float, default=20, help='MB/s one connection can pull')
+    args = ap.parse_args()
+
+    blob = os.urandom(args.size_mb * 1024 * 1024 - 12345)  # uneven tail on purpose
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'out.bin')
+        base = None
+        for n in args.connections:
+            elapsed = await run(blob, n, args.rtt_ms / 1000, args.mbps, path)
+            base = base or elapsed
+            print(f"{n:>2} connections: {elapsed:6.2f}s  {len(blob) / elapsed / 1024 / 1024:7.1f} MB/s  x{base / elapsed:.2f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+"""
+Per-call cost of decrypting a session string: deriving the key every time
+(the old dcs) against the cached KeyRing, plus how long the event loop is
+blocked while an async caller waits for a cold key.
+
+    python -m bench.encrypt_bench --calls 50
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from utils.encrypt import KeyRing, dyk
+import base64
+
+
+def old_dcs(ed, ring):
+    dat = base64.b64decode(ed.partition(':')[2])
+    k = dyk(*ring.secrets[ring.current])
+    dec = Cipher(algorithms.AES(k), modes.GCM(dat[:12], dat[12:28])).decryptor()
+    return (dec.update(dat[28:]) + dec.finalize()).decode()
+
+
+def per_call(fn, calls):
+    st = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - st) / calls * 1000
+
+
+async def max_stall(coro):
+    # longest gap between ticks of a 1 ms heartbeat while `coro` runs
+    worst, last, done = 0.0, time.perf_counter(), False
+
+    async def beat():
+        nonlocal worst, last
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst, last = max(worst, now - last), now
+
+    hb = asyncio.create_task(beat())
+    await asyncio.sleep(0.01)
+    await coro
+    done = True
+    await hb
+    return worst * 1000
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--calls', type=int, default=50)
+    args = ap.parse_args()
+
+    ring = KeyRing()
+    ed = ring.encrypt('1BVtsOK8Bu' + 'x' * 340)  # about the size of a pyrogram session string
+    print(f"derive every call : {per_call(lambda: old_dcs(ed, ring), args.calls):8.3f} ms/call")
+    print(f"cached key        : {per_call(lambda: ring.decrypt(ed), args.calls * 100):8.3f} ms/call")
+
+    async def cold_inline():
+        KeyRing().key(ring.current)
+
+    print(f"loop stall, derive on loop : {await max_stall(cold_inline()):7.1f} ms")
+    print(f"loop stall, KeyRing.warm   : {await max_stall(KeyRing().warm()):7.1f} ms")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+"""
+Header parser (utils.mediainfo) against the cv2 path it replaced, on real
+files given on the command line or, without arguments, on synthetic MP4 and
+MKV headers followed by a large zero-filled payload. cv2 rows only appear
+when opencv is installed; its import cost is reported separately.
+
+    python -m bench.probe_bench [video ...] --runs 200
+"""
+
+import os
+import sys
+import time
+import struct
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.mediainfo import parse
+
+
+def box(kind, payload):
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def ebml(eid, payload):
+    idb = eid.to_bytes((eid.bit_length() + 7) // 8, 'big')
+    return idb + (0x01 << 56 | len(payload)).to_bytes(8, 'big') + payload
+
+
+def fake_mp4(path, w=1280, h=720, seconds=5400, payload_mb=64):
+    mvhd = box(b'mvhd', bytes(4) + struct.pack('>IIII', 0, 0, 1000, seconds * 1000) + bytes(80))
+    tkhd = box(b'tkhd', bytes(4) + bytes(72) + struct.pack('>II', w << 16, h << 16))
+    hdlr = box(b'hdlr', bytes(8) + b'vide' + bytes(13))
+    moov = box(b'moov', mvhd + box(b'trak', tkhd + box(b'mdia', hdlr)))
+    with open(path, 'wb') as f:
+        f.write(box(b'ftyp', b'isom' + bytes(4) + b'isommp41') + moov)
+        f.write(struct.pack('>I4s', 8 + payload_mb * 2 ** 20, b'mdat'))
+        f.truncate(f.tell() + payload_mb * 2 ** 20)
+
+
+def fake_mkv(path, w=1920, h=1080, seconds=5400, payload_mb=64):
+    info = ebml(0x1549A966, ebml(0x2AD7B1, (1000000).to_bytes(3, 'big')) + ebml(0x4489, struct.pack('>d', seconds * 1000.0)))
+    video = ebml(0xE0, ebml(0xB0, w.to_bytes(2, 'big')) + ebml(0xBA, h.to_bytes(2, 'big')))
+    tracks = ebml(0x1654AE6B, ebml(0xAE, ebml(0x83, b'\x01') + video))
+    with open(path, 'wb') as f:
+        f.write(ebml(0x1A45DFA3, ebml(0x4282, b'matroska')))
+        f.write(b'\x18\x53\x80\x67' + b'\x01\xff\xff\xff\xff\xff\xff\xff' + info + tracks)
+        f.write(b'\x1f\x43\xb6\x75' + (0x01 << 56 | payload_mb * 2 ** 20).to_bytes(8, 'big'))
+        f.truncate(f.tell() + payload_mb * 2 ** 20)
+
+
+def cv2_probe(cv2, path):
+    vcap = cv2.VideoCapture(path)
+    try:
+        fps = vcap.get(cv2.CAP_PROP_FPS)
+        return {'width': round(vcap.get(cv2.CAP_PROP_FRAME_WIDTH)), 'height': round(vcap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'duration': round(vcap.get(cv2.CAP_PROP_FRAME_COUNT) / fps) if fps > 0 else 0}
+    finally:
+        vcap.release()
+
+
+def timed(fn, runs):
+    st = time.perf_counter()
+    for _ in range(runs):
+        out = fn()
+    return (time.perf_counter() - st) / runs * 1000, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('files', nargs='*')
+    ap.add_argument('--runs', type=int, default=200)
+    args = ap.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    files = args.files
+    if not files:
+        files = [os.path.join(tmp.name, 'fake.mp4'), os.path.join(tmp.name, 'fake.mkv')]
+        fake_mp4(files[0])
+        fake_mkv(files[1])
+
+    st = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'])
+    bare = time.perf_counter() - st
+    st = time.perf_counter()
+    r = subprocess.run([sys.executable, '-c', 'import cv2'], capture_output=True)
+    if r.returncode == 0:
+        print(f"import cv2: {time.perf_counter() - st - bare:.3f}s over a bare interpreter")
+        import cv2
+    else:
+        cv2 = None
+        print("cv2 not installed, header parser only")
+
+    for path in files:
+        ms, out = timed(lambda: parse(path), args.runs)
+        print(f"{os.path.basename(path):>24}  header: {ms:7.3f} ms  {out}")
+        if cv2:
+            ms, out = timed(lambda: cv2_probe(cv2, path), max(1, args.runs // 20))
+            print(f"{'':>24}  cv2:    {ms:7.3f} ms  {out}")
+    tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -35,6 +35,8 @@ FORCE_SUB    = int(os.getenv("FORCE_SUB", "-1002008678394"))
 # ─── SECURITY KEYS ──────────────────────────────────────────────────────────────
 MASTER_KEY   = os.getenv("MASTER_KEY", "gK8HzLfT9QpViJcYeB5wRa3DmN7P2xUq")  # session encryption
 IV_KEY       = os.getenv("IV_KEY", "s7Yx5CpVmE3F")  # decryption key
+KEY_VERSION  = int(os.getenv("KEY_VERSION", "1"))  # bump together with MASTER_KEY/IV_KEY when rotating
+OLD_KEYS     = os.getenv("OLD_KEYS", "")  # retired keys still readable: "1=master:iv,2=master:iv"
 
 # ─── COOKIES HANDLING ───────────────────────────────────────────────────────────
 YT_COOKIES   = os.getenv("YT_COOKIES", YTUB_COOKIES)
@@ -44,6 +46,42 @@ INSTA_COOKIES = os.getenv("INSTA_COOKIES", INST_COOKIES)
 FREEMIUM_LIMIT = int(os.getenv("FREEMIUM_LIMIT", "0"))
 PREMIUM_LIMIT  = int(os.getenv("PREMIUM_LIMIT", "500"))
 
+# ─── BATCH ENGINE ───────────────────────────────────────────────────────────────
+BATCH_PIPELINE_DEPTH = int(os.getenv("BATCH_PIPELINE_DEPTH", "2"))  # items buffered between fetch/download/upload
+PACE_MIN_DELAY = float(os.getenv("PACE_MIN_DELAY", "1"))  # seconds between batch items when not throttled
+PACE_MAX_DELAY = float(os.getenv("PACE_MAX_DELAY", "60"))
+FLOOD_RETRIES  = int(os.getenv("FLOOD_RETRIES", "3"))  # retries of a call after sleeping out its FloodWait
+TRANSFER_FLOOD_SLEEP = int(os.getenv("TRANSFER_FLOOD_SLEEP", "120"))  # FloodWaits up to this long inside an upload/download are slept at the RPC that raised them
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", "3600"))  # seconds a resolved source chat stays cached
+MAX_DOWNLOADS  = int(os.getenv("MAX_DOWNLOADS", "4"))  # process-wide concurrent downloads
+MAX_UPLOADS    = int(os.getenv("MAX_UPLOADS", "4"))  # process-wide concurrent uploads
+MAX_INFLIGHT_MB = int(os.getenv("MAX_INFLIGHT_MB", "8192"))  # bytes of media being transferred at once
+PREMIUM_WEIGHT = int(os.getenv("PREMIUM_WEIGHT", "4"))  # fair-share weight of a premium job vs a free one
+JOBSTORE_FLUSH_INTERVAL = float(os.getenv("JOBSTORE_FLUSH_INTERVAL", "5"))  # seconds between batch state journal flushes
+BATCH_AUTO_RESUME = os.getenv("BATCH_AUTO_RESUME", "false").lower() == "true"  # resume interrupted batches at startup without asking
+RELAY_MODE     = os.getenv("RELAY_MODE", "true").lower() == "true"  # stream audio/documents from download into upload
+RELAY_MIN_MB   = int(os.getenv("RELAY_MIN_MB", "20"))  # smaller files just go through disk
+RELAY_BUFFER_MB = int(os.getenv("RELAY_BUFFER_MB", "16"))  # memory held per relay between download and upload
+RELAY_UPLOAD_WORKERS = int(os.getenv("RELAY_UPLOAD_WORKERS", "2"))
+DOWNLOAD_CONNECTIONS = int(os.getenv("DOWNLOAD_CONNECTIONS", "4"))  # parallel media sessions per large download, 1 disables
+PARALLEL_MIN_MB = int(os.getenv("PARALLEL_MIN_MB", "64"))  # below this a single connection is fast enough
+UPLOAD_CONNECTIONS = int(os.getenv("UPLOAD_CONNECTIONS", "4"))  # media sessions per big upload on pyrogram clients, 1 disables
+MEDIA_CACHE_DAYS = int(os.getenv("MEDIA_CACHE_DAYS", "30"))  # idle days before a reusable upload is forgotten, 0 disables
+PROGRESS_EDITS_PER_SEC = float(os.getenv("PROGRESS_EDITS_PER_SEC", "10"))  # progress edits across all chats
+PROGRESS_CHAT_INTERVAL = float(os.getenv("PROGRESS_CHAT_INTERVAL", "3"))  # min seconds between progress edits in one chat
+CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "50"))  # live per-user bots and session clients
+CLIENT_IDLE_TIMEOUT = int(os.getenv("CLIENT_IDLE_TIMEOUT", "1800"))  # seconds before an unused client is stopped
+PROBE_WORKERS = int(os.getenv("PROBE_WORKERS", "4"))  # threads probing video metadata, shared by all jobs
+PROBE_CACHE_SIZE = int(os.getenv("PROBE_CACHE_SIZE", "1024"))
+FFMPEG_WORKERS = int(os.getenv("FFMPEG_WORKERS", "2"))  # concurrent ffmpeg processes
+FFMPEG_TIMEOUT = int(os.getenv("FFMPEG_TIMEOUT", "120"))  # seconds before an ffmpeg run is killed
+WORK_DIR = os.getenv("WORK_DIR", "downloads")  # per-job download dirs go here; point it at tmpfs or a fast volume
+WORK_QUOTA_GB = float(os.getenv("WORK_QUOTA_GB", "0"))  # bytes all jobs may hold on disk together, 0 = free space only
+WORK_MIN_FREE_MB = int(os.getenv("WORK_MIN_FREE_MB", "512"))  # always left free on the volume
+WORK_WAIT = int(os.getenv("WORK_WAIT", "600"))  # seconds a download waits for space before it is skipped
+SETTINGS_CACHE_SIZE = int(os.getenv("SETTINGS_CACHE_SIZE", "1000"))  # user documents kept in memory
+SETTINGS_CACHE_TTL = int(os.getenv("SETTINGS_CACHE_TTL", "600"))  # seconds before a cached user document is reloaded
+
 # ─── UI / LINKS ─────────────────────────────────────────────────────────────────
 JOIN_LINK     = os.getenv("JOIN_LINK", "https://t.me/team_spy_pro")
 ADMIN_CONTACT = os.getenv("ADMIN_CONTACT", "https://t.me/username_of_admin")
@@ -2,122 +2,191 @@
 # Licensed under the GNU General Public License v3.0.  
 # See LICENSE file in the repository root for full license text.
 
-import os, re, time, asyncio, json, asyncio 
+import os, re, time, asyncio 
 from pyrogram import Client, filters
-from pyrogram.types import Message
-from pyrogram.errors import UserNotParticipant
-from config import API_ID, API_HASH, LOG_GROUP, STRING, FORCE_SUB, FREEMIUM_LIMIT, PREMIUM_LIMIT
+from pyrogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
+from pyrogram.types import InputMediaPhoto, InputMediaVideo, InputMediaAudio, InputMediaDocument
+from pyrogram.errors import UserNotParticipant, PeerIdInvalid, ChannelPrivate
+from config import API_ID, API_HASH, LOG_GROUP, STRING, FORCE_SUB, FREEMIUM_LIMIT, PREMIUM_LIMIT, BATCH_AUTO_RESUME
+from config import RELAY_MODE, RELAY_MIN_MB, DOWNLOAD_CONNECTIONS, PARALLEL_MIN_MB
 from utils.func import get_user_data, screenshot, thumbnail, get_video_metadata
-from utils.func import get_user_data_key, process_text_with_rules, is_premium_user, E
+from utils.func import get_user_data_key, process_text_with_rules, is_premium_user, E, load_peers, save_peers
+from utils.func import get_cached_media, cache_media, drop_cached_media, get_user_settings, ensure_indexes, media_fingerprint
+from utils.func import get_bot_session, save_bot_session
 from shared_client import app as X
-from plugins.settings import rename_file
+from plugins.settings import rename_file, rename_name
 from plugins.start import subscribe as sub
 from utils.custom_filters import login_in_progress
-from utils.encrypt import dcs
+from utils.encrypt import adcs, KEYS
+from utils.pipeline import Pipeline
+from utils.pacing import Pacer, Paced
+from utils.chatcache import CHATS
+from utils.jobs import JOBS
+from utils.scheduler import SCHED
+from utils.jobstore import JobStore
+from utils.progress import PROGRESS
+from utils.clients import CLIENTS
+from utils.probe import PROBE
+from utils.ffmpeg import FFMPEG
+from utils.workspace import WORKSPACE, WorkspaceFull
+from utils.transfer import relay_upload, send_uploaded, parallel_download, use_parallel_upload
 from typing import Dict, Any, Optional
 
 
 Y = None if not STRING else __import__('shared_client').userbot
-Z, P, UB, UC, emp = {}, {}, {}, {}, {}
+Z = {}
 
-ACTIVE_USERS = {}
 ACTIVE_USERS_FILE = "active_users.json"
+ACTIVE_USERS = JobStore("active_users.jsonl", legacy_path=ACTIVE_USERS_FILE).load()
+FETCH_WINDOW = 100  # get_messages accepts at most 100 ids per call
+VIDEO_EXTS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.3gp', '.ogv'}
+IN_ALBUM = object()  # batch slot already delivered as part of an earlier album
+AUDIO_EXTS = {'.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a', '.opus', '.aiff', '.ac3'}
 
 # fixed directory file_name problems 
 def sanitize(filename):
     return re.sub(r'[<>:"/\\|?*\']', '_', filename).strip(" .")[:255]
 
-def load_active_users():
-    try:
-        if os.path.exists(ACTIVE_USERS_FILE):
-            with open(ACTIVE_USERS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
-    except Exception:
-        return {}
-
-async def save_active_users_to_file():
-    try:
-        with open(ACTIVE_USERS_FILE, 'w') as f:
-            json.dump(ACTIVE_USERS, f)
-    except Exception as e:
-        print(f"Error saving active users: {e}")
-
 async def add_active_batch(user_id: int, batch_info: Dict[str, Any]):
-    ACTIVE_USERS[str(user_id)] = batch_info
-    await save_active_users_to_file()
+    ACTIVE_USERS.put(str(user_id), batch_info)
 
+# entries without a running job are checkpoints of interrupted batches, they don't block new work
 def is_user_active(user_id: int) -> bool:
-    return str(user_id) in ACTIVE_USERS
-
-async def update_batch_progress(user_id: int, current: int, success: int):
-    if str(user_id) in ACTIVE_USERS:
-        ACTIVE_USERS[str(user_id)]["current"] = current
-        ACTIVE_USERS[str(user_id)]["success"] = success
-        await save_active_users_to_file()
-
-async def request_batch_cancel(user_id: int):
-    if str(user_id) in ACTIVE_USERS:
-        ACTIVE_USERS[str(user_id)]["cancel_requested"] = True
-        await save_active_users_to_file()
-        return True
-    return False
+    return JOBS.get(user_id) is not None
 
-def should_cancel(user_id: int) -> bool:
-    user_str = str(user_id)
-    return user_str in ACTIVE_USERS and ACTIVE_USERS[user_str].get("cancel_requested", False)
+async def update_batch_progress(user_id: int, current: int, success: int, stages: Optional[str] = None, pacing: Optional[str] = None, next_id: Optional[int] = None):
+    fields = {"current": current, "success": success}
+    if next_id: fields["next"] = next_id
+    if stages: fields["stages"] = stages
+    if pacing: fields["pacing"] = pacing
+    ACTIVE_USERS.update(str(user_id), **fields)
 
 async def remove_active_batch(user_id: int):
-    if str(user_id) in ACTIVE_USERS:
-        del ACTIVE_USERS[str(user_id)]
-        await save_active_users_to_file()
+    ACTIVE_USERS.delete(str(user_id))
 
 def get_batch_info(user_id: int) -> Optional[Dict[str, Any]]:
     return ACTIVE_USERS.get(str(user_id))
 
-ACTIVE_USERS = load_active_users()
+def resume_markup(uid):
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("▶️ Resume", callback_data=f"rsm_{uid}"),
+        InlineKeyboardButton("🗑 Discard", callback_data=f"dsc_{uid}")
+    ]])
 
-async def upd_dlg(c):
+async def offer_resume(uid, cp, reason):
     try:
-        async for _ in c.get_dialogs(limit=100): pass
+        await X.send_message(int(cp['did']), f"{reason}\n\n📦 {cp['current']}/{cp['total']} done, ✅ {cp['success']} sent.\nNext message: {cp['next']}", reply_markup=resume_markup(uid))
+    except Exception as e:
+        print(f"Could not offer resume to {uid}: {e}")
+
+async def resume_batch(uid):
+    cp = get_batch_info(uid)
+    if not cp: return 'No interrupted batch found.'
+    if JOBS.get(uid): return 'Batch is already running.'
+    ubot = await get_ubot(uid)
+    uc = await get_uclient(uid)
+    if not ubot or not uc: return 'Missing client setup'
+    done = cp['current']
+    pt = await X.send_message(int(cp['did']), f"Resuming batch from message {cp['next']}...")
+    job = JOBS.submit(uid, 'batch', run_batch(uid, cp['did'], pt, ubot, uc, cp['cid'], cp['next'], cp['total'] - done, cp['lt'], done, cp['success']))
+    ACTIVE_USERS.update(str(uid), job_id=job.id, progress_message_id=pt.id)
+    return f'Resumed as job `{job.id}`.'
+
+async def run_batch_plugin():
+    await ensure_indexes()
+    WORKSPACE.sweep()  # before any resumed job opens a workspace
+    asyncio.create_task(ACTIVE_USERS.run())
+    asyncio.create_task(CLIENTS.run())
+    await KEYS.warm()
+    for key, cp in ACTIVE_USERS.items():
+        if 'next' not in cp:
+            ACTIVE_USERS.delete(key)  # pre-checkpoint entry, nothing to resume from
+        elif BATCH_AUTO_RESUME:
+            # one owner who blocked the bot or lost their chat must not keep the bot from starting
+            try:
+                print(f"Resuming batch for {key}: {await resume_batch(int(key))}")
+            except Exception as e:
+                print(f"Could not resume batch for {key}: {e}")
+                await offer_resume(int(key), cp, '⚠️ Your batch was interrupted by a restart.')
+        else:
+            await offer_resume(int(key), cp, '⚠️ Your batch was interrupted by a restart.')
+
+@X.on_callback_query(filters.regex(r"^(rsm|dsc)_(\d+)$"))
+async def resume_cb(c, q):
+    action, uid = q.data.split("_")
+    if q.from_user.id != int(uid):
+        await q.answer("Not your batch.", show_alert=True)
+        return
+    if action == "rsm":
+        res = await resume_batch(int(uid))
+    else:
+        await remove_active_batch(int(uid))
+        res = 'Discarded.'
+    await q.answer(res)
+    try: await q.message.edit_text(f"{q.message.text}\n\n{res}")
+    except Exception: pass
+
+async def upd_dlg(c, limit=100):
+    try:
+        async for _ in c.get_dialogs(limit=limit): pass
+        await save_peers(c)
         return True
     except Exception as e:
         print(f'Failed to update dialogs: {e}')
         return False
 
+# walk dialogs only when the session (and the peers loaded from mongo) can't resolve the chat
+async def ensure_peer(c, chat_id):
+    try:
+        await c.resolve_peer(chat_id)
+        return True
+    except Exception:
+        return await upd_dlg(c)
+
+async def remember(c, u, i, cl, peer, xm):
+    if xm and not getattr(xm, "empty", False):
+        protected = bool(getattr(xm.chat, "has_protected_content", False))
+        CHATS.put(c, u, i, peer, 'bot' if cl is c else 'user', protected)
+        await save_peers(cl, [xm.chat.id])
+    return cl, peer, xm
+
 # fixed the old group of 2021-2022 extraction 🌝 (buy krne ka fayda nhi ab old group) ✅ 
-async def get_msg(c, u, i, d, lt):
+async def locate_msg(c, u, i, d, lt):
+    ent = CHATS.get(c, u, i)
+    if ent:
+        cl = c if ent['reader'] == 'bot' else u
+        try:
+            return cl, ent['peer'], await cl.get_messages(ent['peer'], d)
+        except (PeerIdInvalid, ChannelPrivate) as e:
+            print(f'Cached peer for {i} is stale: {e}')
+            CHATS.invalidate(c, u, i)
+        except Exception as e:
+            print(f'Error fetching message: {e}')
+            return None, None, None
     try:
         if lt == 'public':
             try:
                 if str(i).lower().endswith('bot'):
-                    emp[i] = False
                     xm = await u.get_messages(i, d)
-                    emp[i] = getattr(xm, "empty", False)
-                    if not emp[i]:
-                        emp[i] = True
+                    if not getattr(xm, "empty", False):
                         print(f"Bot chat found successfully...")
-                        return xm
+                        return await remember(c, u, i, u, i, xm)
                     
-                if emp[i]:
-                    xm = await c.get_messages(i, d)
+                xm = await c.get_messages(i, d)
+                if not getattr(xm, "empty", False):
                     print(f"fetched by {c.me.username}")
-                    emp[i] = getattr(xm, "empty", False)
-                    if emp[i]:
-                        print(f"Not fetched by {c.me.username}")
-                        try: await u.join_chat(i)
-                        except: pass
-                        xm = await u.get_messages((await u.get_chat(f"@{i}")).id, d)
-                    
-                    return xm                   
+                    return await remember(c, u, i, c, i, xm)
+                print(f"Not fetched by {c.me.username}")
+                try: await u.join_chat(i)
+                except: pass
+                peer = (await u.get_chat(f"@{i}")).id
+                return await remember(c, u, i, u, peer, await u.get_messages(peer, d))
             except Exception as e:
                 print(f'Error fetching public message: {e}')
-                return None
+            return None, None, None
         else:
             if u:
                 try:
-                    async for _ in u.get_dialogs(limit=50): pass
-                    
                     # Try with -100 prefix first
                     if str(i).startswith('-100'):
                         chat_id_100 = i
@@ -131,117 +200,222 @@ async def get_msg(c, u, i, d, lt):
                         chat_id_100 = i
                         chat_id_dash = i
                     
-                    # Try -100 format first
-                    try:
-                        result = await u.get_messages(chat_id_100, d)
-                        if result and not getattr(result, "empty", False):
-                            return result
-                    except Exception:
-                        pass
-                    
-                    # Try - format second
-                    try:
-                        result = await u.get_messages(chat_id_dash, d)
-                        if result and not getattr(result, "empty", False):
-                            return result
-                    except Exception:
-                        pass
+                    # Try -100 format first, then - format
+                    for peer in (chat_id_100, chat_id_dash):
+                        try:
+                            result = await u.get_messages(peer, d)
+                            if result and not getattr(result, "empty", False):
+                                return await remember(c, u, i, u, peer, result)
+                        except Exception:
+                            pass
                     
                     # Final fallback - refresh dialogs and try original
                     try:
-                        async for _ in u.get_dialogs(limit=200): pass
+                        await upd_dlg(u, 200)
                         result = await u.get_messages(i, d)
                         if result and not getattr(result, "empty", False):
-                            return result
+                            return await remember(c, u, i, u, i, result)
                     except Exception:
                         pass
-                    
-                    return None
                             
                 except Exception as e:
                     print(f'Private channel error: {e}')
-                    return None
-            return None
+            return None, None, None
     except Exception as e:
         print(f'Error fetching message: {e}')
-        return None
+        return None, None, None
+
+async def get_msg(c, u, i, d, lt):
+    return (await locate_msg(c, u, i, d, lt))[2]
+
+# whole album of m, read through whichever client located the chat; lo/hi limit it to a batch range
+async def get_group(c, u, i, m, lo=None, hi=None):
+    ent = CHATS.get(c, u, i)
+    cl, peer = (c if ent['reader'] == 'bot' else u, ent['peer']) if ent else (u, m.chat.id)
+    try:
+        group = await cl.get_media_group(peer, m.id)
+    except Exception as e:
+        print(f'Media group fetch error: {e}')
+        return [m]
+    return [g for g in group if (lo is None or g.id >= lo) and (hi is None or g.id < hi)] or [m]
+
+# one get_messages call per FETCH_WINDOW ids once we know which client/peer can read the chat
+async def iter_msgs(c, u, i, start, n, lt):
+    src = None
+    for base in range(start, start + n, FETCH_WINDOW):
+        ids = list(range(base, min(base + FETCH_WINDOW, start + n)))
+        msgs = []
+        if src:
+            try:
+                msgs = await src[0].get_messages(src[1], ids)
+            except Exception as e:
+                print(f'Range fetch error: {e}')
+                src, msgs = None, []
+        if not src:
+            for k, d in enumerate(ids):
+                cl, peer, xm = await locate_msg(c, u, i, d, lt)
+                msgs.append(xm)
+                if xm and not getattr(xm, "empty", False):
+                    src = (cl, peer)
+                    if ids[k + 1:]:
+                        try: msgs += await cl.get_messages(peer, ids[k + 1:])
+                        except Exception as e: print(f'Range fetch error: {e}')
+                    break
+        msgs += [None] * (len(ids) - len(msgs))
+        xm = next((xm for xm in msgs if xm and not getattr(xm, "empty", False)), None)
+        if src and xm:
+            # a batch can outlive CHAT_CACHE_TTL; keep the entry prepare_msg reads fresh while the chat answers
+            CHATS.put(c, u, i, src[1], 'bot' if src[0] is c else 'user', bool(getattr(xm.chat, "has_protected_content", False)))
+        for xm in msgs:
+            yield None if not xm or getattr(xm, "empty", False) else xm
 
 
 async def get_ubot(uid):
     bt = await get_user_data_key(uid, "bot_token", None)
     if not bt: return None
-    if uid in UB: return UB.get(uid)
-    try:
-        bot = Client(f"user_{uid}", bot_token=bt, api_id=API_ID, api_hash=API_HASH)
+    
+    async def login(ss):
+        # custom bots only send, so they skip update handling altogether
+        bot = Client(f"user_{uid}", bot_token=bt, session_string=ss, api_id=API_ID, api_hash=API_HASH, in_memory=True, no_updates=True)
         await bot.start()
-        UB[uid] = bot
+        if ss:
+            try:
+                await bot.get_me()  # a saved session of a revoked token only fails on its first call
+            except Exception:
+                await bot.stop()
+                raise
         return bot
-    except Exception as e:
-        print(f"Error starting bot for user {uid}: {e}")
-        return None
+
+    async def start():
+        try:
+            ss = await get_bot_session(uid, bt)
+            try:
+                bot = await login(ss)
+            except Exception as e:
+                if not ss:
+                    raise
+                print(f"Saved session of bot for user {uid} failed, logging in again: {e}")
+                bot = await login(None)
+                ss = None
+            if not ss:
+                # the pool stops idle bots; restarting from the session avoids another bot authorization
+                await save_bot_session(uid, bt, await bot.export_session_string())
+            return use_parallel_upload(bot)
+        except Exception as e:
+            print(f"Error starting bot for user {uid}: {e}")
+            return None
+    
+    return await CLIENTS.get(('bot', uid), start)
 
 async def get_uclient(uid):
     ud = await get_user_data(uid)
-    ubot = UB.get(uid)
-    cl = UC.get(uid)
+    ubot = CLIENTS.peek(('bot', uid))
+    cl = CLIENTS.peek(('user', uid))
     if cl: return cl
     if not ud: return ubot if ubot else None
     xxx = ud.get('session_string')
-    if xxx:
+    if not xxx: return Y
+    
+    async def start():
         try:
-            ss = dcs(xxx)
-            gg = Client(f'{uid}_client', api_id=API_ID, api_hash=API_HASH, device_model="v3saver", session_string=ss)
+            ss = await adcs(xxx)
+            gg = Client(f'{uid}_client', api_id=API_ID, api_hash=API_HASH, device_model="v3saver", session_string=ss, in_memory=True)
             await gg.start()
-            await upd_dlg(gg)
-            UC[uid] = gg
+            await load_peers(gg)
             return gg
         except Exception as e:
             print(f'User client error: {e}')
-            return ubot if ubot else Y
-    return Y
+            return None
+    
+    return await CLIENTS.get(('user', uid), start) or ubot or Y
 
+# only hands the latest state to PROGRESS, which decides when the edit actually goes out
 async def prog(c, t, C, h, m, st):
-    global P
     p = c / t * 100
-    interval = 10 if t >= 100 * 1024 * 1024 else 20 if t >= 50 * 1024 * 1024 else 30 if t >= 10 * 1024 * 1024 else 50
-    step = int(p // interval) * interval
-    if m not in P or P[m] != step or p >= 100:
-        P[m] = step
-        c_mb = c / (1024 * 1024)
-        t_mb = t / (1024 * 1024)
-        bar = '🟢' * int(p / 10) + '🔴' * (10 - int(p / 10))
-        speed = c / (time.time() - st) / (1024 * 1024) if time.time() > st else 0
-        eta = time.strftime('%M:%S', time.gmtime((t - c) / (speed * 1024 * 1024))) if speed > 0 else '00:00'
-        await C.edit_message_text(h, m, f"__**Pyro Handler...**__\n\n{bar}\n\n⚡**__Completed__**: {c_mb:.2f} MB / {t_mb:.2f} MB\n📊 **__Done__**: {p:.2f}%\n🚀 **__Speed__**: {speed:.2f} MB/s\n⏳ **__ETA__**: {eta}\n\n**__Powered by Team SPY__**")
-        if p >= 100: P.pop(m, None)
-
-async def send_direct(c, m, tcid, ft=None, rtmid=None):
+    c_mb = c / (1024 * 1024)
+    t_mb = t / (1024 * 1024)
+    bar = '🟢' * int(p / 10) + '🔴' * (10 - int(p / 10))
+    speed = c / (time.time() - st) / (1024 * 1024) if time.time() > st else 0
+    eta = time.strftime('%M:%S', time.gmtime((t - c) / (speed * 1024 * 1024))) if speed > 0 else '00:00'
+    PROGRESS.update(C, h, m, f"__**Pyro Handler...**__\n\n{bar}\n\n⚡**__Completed__**: {c_mb:.2f} MB / {t_mb:.2f} MB\n📊 **__Done__**: {p:.2f}%\n🚀 **__Speed__**: {speed:.2f} MB/s\n⏳ **__ETA__**: {eta}\n\n**__Powered by Team SPY__**")
+
+def media_size(m):
+    for kind in ('video', 'audio', 'document', 'photo', 'voice', 'video_note', 'animation', 'sticker'):
+        obj = getattr(m, kind, None)
+        if obj: return getattr(obj, 'file_size', 0) or 0
+    return 0
+
+def media_kind(m):
+    return next((k for k in ('video', 'video_note', 'voice', 'sticker', 'audio', 'photo', 'document') if getattr(m, k, None)), None)
+
+def media_uid(m):
+    kind = media_kind(m)
+    return getattr(getattr(m, kind), 'file_unique_id', None) if kind else None
+
+# the small thumbnail telegram already made for the source, saved next to f
+async def source_thumb(u, m, f):
+    kind = media_kind(m)
+    thumbs = getattr(getattr(m, kind), 'thumbs', None) if kind else None
+    if not thumbs: return None
     try:
-        if m.video:
-            await c.send_video(tcid, m.video.file_id, caption=ft, duration=m.video.duration, width=m.video.width, height=m.video.height, reply_to_message_id=rtmid)
-        elif m.video_note:
-            await c.send_video_note(tcid, m.video_note.file_id, reply_to_message_id=rtmid)
-        elif m.voice:
-            await c.send_voice(tcid, m.voice.file_id, reply_to_message_id=rtmid)
-        elif m.sticker:
-            await c.send_sticker(tcid, m.sticker.file_id, reply_to_message_id=rtmid)
-        elif m.audio:
-            await c.send_audio(tcid, m.audio.file_id, caption=ft, duration=m.audio.duration, performer=m.audio.performer, title=m.audio.title, reply_to_message_id=rtmid)
-        elif m.photo:
-            photo_id = m.photo.file_id if hasattr(m.photo, 'file_id') else m.photo[-1].file_id
-            await c.send_photo(tcid, photo_id, caption=ft, reply_to_message_id=rtmid)
-        elif m.document:
-            await c.send_document(tcid, m.document.file_id, caption=ft, file_name=m.document.file_name, reply_to_message_id=rtmid)
+        path = await u.download_media(thumbs[-1].file_id, file_name=os.path.abspath(f'{os.path.splitext(f)[0]}_thumb.jpg'))
+    except Exception as e:
+        print(f'Source thumbnail error: {e}')
+        return None
+    if path: FFMPEG.adopt(f, path)
+    return path
+
+# source message fields first; the prober and ffmpeg only run for what the source doesn't carry
+async def video_meta(u, m, f, d):
+    v = m.video or m.animation
+    if v and v.duration and v.width and v.height:
+        meta = {'duration': v.duration, 'width': v.width, 'height': v.height}
+    else:
+        meta = await get_video_metadata(f, media_uid(m))
+    meta['thumb'] = thumbnail(d) or (u and await source_thumb(u, m, f)) or await screenshot(f, meta['duration'], d)
+    return meta
+
+async def remember_upload(c, m, sent, fp=None):
+    # map the source media to what this bot just uploaded so the next request for it is one send;
+    # fp is the fingerprint of the settings that shaped the upload, a hit has to match it
+    kind, out = media_kind(m), media_kind(sent) if sent else None
+    if kind and out and kind != 'sticker':
+        await cache_media(c.me.id, getattr(m, kind).file_unique_id, out, getattr(sent, out).file_id, fp)
+
+# audio and plain documents need no probe or thumbnail from the file itself, so they can skip the disk
+def relayable(m, file_name):
+    if not RELAY_MODE or not (m.audio or m.document): return False
+    ext = os.path.splitext(file_name or '')[1].lower()
+    if m.document and (ext in VIDEO_EXTS or ext in AUDIO_EXTS): return False
+    return RELAY_MIN_MB * 1024 * 1024 <= media_size(m) <= 2 * 1024 ** 3
+
+# cached is a media cache hit: resend this bot's own earlier upload instead of the source file
+async def send_direct(c, m, tcid, ft=None, rtmid=None, cached=None):
+    try:
+        if cached:
+            kind, fid = cached['kind'], cached['file_id']
+        else:
+            kind = media_kind(m)
+            if not kind: return False
+            media = getattr(m, kind)
+            fid = media.file_id if hasattr(media, 'file_id') else media[-1].file_id
+        # telegram keeps duration, size and file name with the file id, so only the caption is passed on
+        if kind in ('video_note', 'voice', 'sticker'):
+            await getattr(c, f'send_{kind}')(tcid, fid, reply_to_message_id=rtmid)
         else:
-            return False
+            await getattr(c, f'send_{kind}')(tcid, fid, caption=ft, reply_to_message_id=rtmid)
         return True
     except Exception as e:
         print(f'Direct send error: {e}')
         return False
 
-async def process_msg(c, u, m, d, lt, uid, i):
+# p is the shared status message of an album: no status of its own, no progress and no relay;
+# cfg is the settings snapshot of the job, read once instead of per message
+async def prepare_msg(c, u, m, d, lt, uid, i, p=None, cfg=None):
+    ws, held, f = WORKSPACE.get(uid), 0, None
     try:
-        cfg_chat = await get_user_data_key(d, 'chat_id', None)
+        cfg = cfg or await get_user_settings(d)
+        cfg_chat = cfg.get('chat_id')
         tcid = d
         rtmid = None
         if cfg_chat:
@@ -251,20 +425,26 @@ async def process_msg(c, u, m, d, lt, uid, i):
                 rtmid = int(parts[1]) if len(parts) > 1 else None
             else:
                 tcid = int(cfg_chat)
+        job = {'m': m, 'd': d, 'tcid': tcid, 'rtmid': rtmid, 'uid': uid}
         
         if m.media:
             orig_text = m.caption.markdown if m.caption else ''
-            proc_text = await process_text_with_rules(d, orig_text)
-            user_cap = await get_user_data_key(d, 'caption', '')
-            ft = f'{proc_text}\n\n{user_cap}' if proc_text and user_cap else user_cap if user_cap else proc_text
+            proc_text = await process_text_with_rules(d, orig_text, cfg)
+            user_cap = cfg.get('caption', '')
+            job['ft'] = f'{proc_text}\n\n{user_cap}' if proc_text and user_cap else user_cap if user_cap else proc_text
             
-            if lt == 'public' and not emp.get(i, False):
-                await send_direct(c, m, tcid, ft, rtmid)
-                return 'Sent directly.'
+            ent = CHATS.get(c, u, i)
+            if lt == 'public' and ent and ent['reader'] == 'bot' and not ent['protected']:
+                job['mode'] = 'direct'
+                return job
+            
+            kind = media_kind(m)
+            job['fp'] = media_fingerprint(cfg, d)
+            hit = kind and await get_cached_media(c.me.id, getattr(m, kind).file_unique_id, job['fp'])
+            if hit:
+                job.update({'mode': 'cached', 'cached': hit})
+                return job
             
-            st = time.time()
-            p = await c.send_message(d, 'Downloading...')
-
             c_name = f"{time.time()}"
             if m.video:
                 file_name = m.video.file_name
@@ -284,110 +464,303 @@ async def process_msg(c, u, m, d, lt, uid, i):
             elif m.photo:
                 file_name = f"{time.time()}.jpg"
                 c_name = sanitize(file_name)
+            
+            album = p is not None
+            if not album and relayable(m, file_name if (m.audio or m.document) else None):
+                has_name = (m.audio and m.audio.file_name) or (m.document and m.document.file_name)
+                job.update({
+                    'mode': 'relay', 'u': u, 'size': media_size(m),
+                    'name': await rename_name(file_name, d, cfg) if has_name else file_name,
+                    'p': await c.send_message(d, 'Relaying...')
+                })
+                return job
     
-            f = await u.download_media(m, file_name=c_name, progress=prog, progress_args=(c, d, p.id, st))
+            size = media_size(m)
+            try:
+                held = await ws.admit(size)
+            except WorkspaceFull as e:
+                return f'Skipped: {e}'
             
+            st = time.time()
+            if not album: p = await c.send_message(d, 'Downloading...')
+            progress = None if album else prog
+            path = ws.path(str(m.id), c_name)  # a dir per message, so same-named album parts don't collide
+            async with SCHED.slot('download', uid, size):
+                if DOWNLOAD_CONNECTIONS > 1 and not m.photo and size >= PARALLEL_MIN_MB * 1024 * 1024:
+                    f = await parallel_download(u, m, path, size, progress=progress, progress_args=(c, d, p.id, st))
+                else:
+                    f = await u.download_media(m, file_name=path, progress=progress, progress_args=(c, d, p.id, st))
+            
+            if not album: PROGRESS.discard(c, d, p.id)
             if not f:
-                await c.edit_message_text(d, p.id, 'Failed.')
+                ws.release(held)
+                if not album: await c.edit_message_text(d, p.id, 'Failed.')
                 return 'Failed.'
             
-            await c.edit_message_text(d, p.id, 'Renaming...')
+            if not album: await c.edit_message_text(d, p.id, 'Renaming...')
             if (
                 (m.video and m.video.file_name) or
                 (m.audio and m.audio.file_name) or
                 (m.document and m.document.file_name)
             ):
-                f = await rename_file(f, d, p)
+                f = await rename_file(f, d, p, cfg)
             
-            fsize = os.path.getsize(f) / (1024 * 1024 * 1024)
-            th = thumbnail(d)
-            
-            if fsize > 2 and Y:
-                st = time.time()
-                await c.edit_message_text(d, p.id, 'File is larger than 2GB. Using alternative method...')
-                await upd_dlg(Y)
-                mtd = await get_video_metadata(f)
-                dur, h, w = mtd['duration'], mtd['width'], mtd['height']
-                th = await screenshot(f, dur, d)
-                
-                send_funcs = {'video': Y.send_video, 'video_note': Y.send_video_note, 
-                            'voice': Y.send_voice, 'audio': Y.send_audio, 
-                            'photo': Y.send_photo, 'document': Y.send_document}
-                
-                for mtype, func in send_funcs.items():
-                    if f.endswith('.mp4'): mtype = 'video'
-                    if getattr(m, mtype, None):
-                        sent = await func(LOG_GROUP, f, thumb=th if mtype == 'video' else None, 
-                                        duration=dur if mtype == 'video' else None,
-                                        height=h if mtype == 'video' else None,
-                                        width=w if mtype == 'video' else None,
-                                        caption=ft if m.caption and mtype not in ['video_note', 'voice'] else None, 
-                                        reply_to_message_id=rtmid, progress=prog, progress_args=(c, d, p.id, st))
-                        break
-                else:
-                    sent = await Y.send_document(LOG_GROUP, f, thumb=th, caption=ft if m.caption else None,
-                                                reply_to_message_id=rtmid, progress=prog, progress_args=(c, d, p.id, st))
-                
-                await c.copy_message(d, LOG_GROUP, sent.id)
-                os.remove(f)
-                await c.delete_messages(d, p.id)
-                
-                return 'Done (Large file).'
-            
-            await c.edit_message_text(d, p.id, 'Uploading...')
-            st = time.time()
-
-            try:
-                video_extensions = ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.3gp', '.ogv']
-                audio_extensions = ['.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a', '.opus', '.aiff', '.ac3']
-                file_ext = os.path.splitext(f)[1].lower()
-                if m.video or (m.document and file_ext in video_extensions):
-                    mtd = await get_video_metadata(f)
-                    dur, h, w = mtd['duration'], mtd['width'], mtd['height']
-                    th = await screenshot(f, dur, d)
-                    await c.send_video(tcid, video=f, caption=ft if m.caption else None, 
-                                    thumb=th, width=w, height=h, duration=dur, 
-                                    progress=prog, progress_args=(c, d, p.id, st), 
-                                    reply_to_message_id=rtmid)
-                elif m.video_note:
-                    await c.send_video_note(tcid, video_note=f, progress=prog, 
-                                        progress_args=(c, d, p.id, st), reply_to_message_id=rtmid)
-                elif m.voice:
-                    await c.send_voice(tcid, f, progress=prog, progress_args=(c, d, p.id, st), 
-                                    reply_to_message_id=rtmid)
-                elif m.sticker:
-                    await c.send_sticker(tcid, m.sticker.file_id, reply_to_message_id=rtmid)
-                elif m.audio or (m.document and file_ext in audio_extensions):
-                    await c.send_audio(tcid, audio=f, caption=ft if m.caption else None, 
-                                    thumb=th, progress=prog, progress_args=(c, d, p.id, st), 
-                                    reply_to_message_id=rtmid)
-                elif m.photo:
-                    await c.send_photo(tcid, photo=f, caption=ft if m.caption else None, 
-                                    progress=prog, progress_args=(c, d, p.id, st), 
-                                    reply_to_message_id=rtmid)
-                elif m.document:
-                    await c.send_document(tcid, document=f, caption=ft if m.caption else None, 
-                                        progress=prog, progress_args=(c, d, p.id, st), 
-                                        reply_to_message_id=rtmid)
-                else:
-                    await c.send_document(tcid, document=f, caption=ft if m.caption else None, 
-                                        progress=prog, progress_args=(c, d, p.id, st), 
-                                        reply_to_message_id=rtmid)
-            except Exception as e:
-                await c.edit_message_text(d, p.id, f'Upload failed: {str(e)[:30]}')
-                if os.path.exists(f): os.remove(f)
-                return 'Failed.'
-            
-            os.remove(f)
-            await c.delete_messages(d, p.id)
-            
-            return 'Done.'
+            job.update({'mode': 'file', 'f': f, 'p': p, 'held': held})
+            if m.video or m.animation or os.path.splitext(f)[1].lower() in VIDEO_EXTS:
+                job['meta'] = await video_meta(u, m, f, d)
+            return job
             
         elif m.text:
+            job['mode'] = 'text'
+            return job
+    except Exception as e:
+        if f: discard({'f': f, 'uid': uid})  # downloaded, but the job never got it
+        ws.release(held)
+        return f'Error: {str(e)[:50]}'
+
+async def deliver_msg(c, job):
+    if not isinstance(job, dict): return job
+    m, d, tcid, rtmid = job['m'], job['d'], job['tcid'], job['rtmid']
+    ft = job.get('ft')
+    try:
+        if job['mode'] == 'text':
             await c.send_message(tcid, text=m.text.markdown, reply_to_message_id=rtmid)
             return 'Sent.'
+        
+        if job['mode'] == 'direct':
+            await send_direct(c, m, tcid, ft, rtmid)
+            return 'Sent directly.'
+        
+        if job['mode'] == 'cached':
+            if await send_direct(c, m, tcid, ft if m.caption else None, rtmid, cached=job['cached']):
+                return 'Sent from cache.'
+            await drop_cached_media(c.me.id, job['cached']['unique_id'])
+            return 'Failed.'
+        
+        if job['mode'] == 'relay':
+            async with SCHED.slot('download', job['uid'], job['size']), SCHED.slot('upload', job['uid']):
+                return await relay_file(c, job)
+        
+        if job['mode'] == 'album':
+            async with SCHED.slot('upload', job['uid'], job_bytes(job)):
+                return await deliver_group(c, job)
+        
+        try:
+            async with SCHED.slot('upload', job['uid'], os.path.getsize(job['f'])):
+                return await upload_file(c, job)
+        finally:
+            discard(job)  # whatever happened to the upload, the file and its space go back
     except Exception as e:
         return f'Error: {str(e)[:50]}'
+
+# stream straight from the user client into the upload, the file never touches disk
+async def relay_file(c, job):
+    m, d, p = job['m'], job['d'], job['p']
+    st = time.time()
+    try:
+        inp = await relay_upload(c, job['u'], m, job['size'], progress=prog, progress_args=(c, d, p.id, st))
+        sent = await send_uploaded(c, job['tcid'], inp, 'audio' if m.audio else 'document', job['name'],
+                            caption=job['ft'] if m.caption else None, thumb=thumbnail(d),
+                            duration=m.audio.duration if m.audio else 0,
+                            performer=m.audio.performer if m.audio else None,
+                            title=m.audio.title if m.audio else None,
+                            reply_to_message_id=job['rtmid'])
+    except Exception as e:
+        PROGRESS.discard(c, d, p.id)
+        await c.edit_message_text(d, p.id, f'Relay failed: {str(e)[:30]}')
+        return 'Failed.'
+    
+    await remember_upload(c, m, sent, job.get('fp'))
+    await c.delete_messages(d, p.id)
+    return 'Done.'
+
+async def upload_file(c, job):
+    m, d, tcid, rtmid = job['m'], job['d'], job['tcid'], job['rtmid']
+    ft = job.get('ft')
+    f, p = job['f'], job['p']
+    fsize = os.path.getsize(f) / (1024 * 1024 * 1024)
+    th = thumbnail(d)
+
+    if fsize > 2 and Y:
+        yb = c.pacer.wrap(Y) if isinstance(c, Paced) else Y
+        st = time.time()
+        await c.edit_message_text(d, p.id, 'File is larger than 2GB. Using alternative method...')
+        await ensure_peer(yb, LOG_GROUP)
+        mtd = job.get('meta') or await video_meta(None, m, f, d)
+        dur, h, w, th = mtd['duration'], mtd['height'], mtd['width'], mtd['thumb']
+
+        send_funcs = {'video': yb.send_video, 'video_note': yb.send_video_note, 
+                    'voice': yb.send_voice, 'audio': yb.send_audio, 
+                    'photo': yb.send_photo, 'document': yb.send_document}
+
+        for mtype, func in send_funcs.items():
+            if f.endswith('.mp4'): mtype = 'video'
+            if getattr(m, mtype, None):
+                sent = await func(LOG_GROUP, f, thumb=th if mtype == 'video' else None, 
+                                duration=dur if mtype == 'video' else None,
+                                height=h if mtype == 'video' else None,
+                                width=w if mtype == 'video' else None,
+                                caption=ft if m.caption and mtype not in ['video_note', 'voice'] else None, 
+                                reply_to_message_id=rtmid, progress=prog, progress_args=(c, d, p.id, st))
+                break
+        else:
+            sent = await yb.send_document(LOG_GROUP, f, thumb=th, caption=ft if m.caption else None,
+                                        reply_to_message_id=rtmid, progress=prog, progress_args=(c, d, p.id, st))
+
+        await remember_upload(c, m, await c.copy_message(d, LOG_GROUP, sent.id), job.get('fp'))
+        discard(job)
+        await c.delete_messages(d, p.id)
+
+        return 'Done (Large file).'
+
+    await c.edit_message_text(d, p.id, 'Uploading...')
+    st = time.time()
+
+    try:
+        file_ext = os.path.splitext(f)[1].lower()
+        if m.video or (m.document and file_ext in VIDEO_EXTS):
+            mtd = job.get('meta') or await video_meta(None, m, f, d)
+            dur, h, w, th = mtd['duration'], mtd['height'], mtd['width'], mtd['thumb']
+            sent = await c.send_video(tcid, video=f, caption=ft if m.caption else None, 
+                            thumb=th, width=w, height=h, duration=dur, 
+                            progress=prog, progress_args=(c, d, p.id, st), 
+                            reply_to_message_id=rtmid)
+        elif m.video_note:
+            sent = await c.send_video_note(tcid, video_note=f, progress=prog, 
+                                progress_args=(c, d, p.id, st), reply_to_message_id=rtmid)
+        elif m.voice:
+            sent = await c.send_voice(tcid, f, progress=prog, progress_args=(c, d, p.id, st), 
+                            reply_to_message_id=rtmid)
+        elif m.sticker:
+            sent = await c.send_sticker(tcid, m.sticker.file_id, reply_to_message_id=rtmid)
+        elif m.audio or (m.document and file_ext in AUDIO_EXTS):
+            sent = await c.send_audio(tcid, audio=f, caption=ft if m.caption else None, 
+                            thumb=th, progress=prog, progress_args=(c, d, p.id, st), 
+                            reply_to_message_id=rtmid)
+        elif m.photo:
+            sent = await c.send_photo(tcid, photo=f, caption=ft if m.caption else None, 
+                            progress=prog, progress_args=(c, d, p.id, st), 
+                            reply_to_message_id=rtmid)
+        elif m.document:
+            sent = await c.send_document(tcid, document=f, caption=ft if m.caption else None, 
+                                progress=prog, progress_args=(c, d, p.id, st), 
+                                reply_to_message_id=rtmid)
+        else:
+            sent = await c.send_document(tcid, document=f, caption=ft if m.caption else None, 
+                                progress=prog, progress_args=(c, d, p.id, st), 
+                                reply_to_message_id=rtmid)
+    except Exception as e:
+        PROGRESS.discard(c, d, p.id)
+        await c.edit_message_text(d, p.id, f'Upload failed: {str(e)[:30]}')
+        discard(job)
+        return 'Failed.'
+
+    discard(job)
+    await remember_upload(c, m, sent, job.get('fp'))
+    await c.delete_messages(d, p.id)
+
+    return 'Done.'
+
+# the downloaded file, its thumbnail and the space it was admitted for
+def discard(job):
+    f = job.get('f')
+    if f:
+        FFMPEG.drop(f)
+        if os.path.exists(f): os.remove(f)
+    WORKSPACE.release(job['uid'], job.pop('held', 0))
+
+def job_bytes(job):
+    if not isinstance(job, dict): return 0
+    if job['mode'] == 'album': return sum(job_bytes(j) for j in job['jobs'])
+    if job['mode'] == 'relay': return job['size']
+    return os.path.getsize(job['f']) if job.get('f') and os.path.exists(job['f']) else 0
+
+# parts of an album download side by side under one status message
+async def prepare_group(c, u, ms, d, lt, uid, i, cfg=None):
+    p = await c.send_message(d, f'Downloading album ({len(ms)} items)...')
+    cfg = cfg or await get_user_settings(d)
+    jobs = await asyncio.gather(*(prepare_msg(c, u, m, d, lt, uid, i, p, cfg) for m in ms))
+    return {'mode': 'album', 'ms': ms, 'jobs': list(jobs), 'd': d, 'p': p, 'uid': uid}
+
+async def album_media(c, job):
+    m, d = job['m'], job['d']
+    cap = job.get('ft') if m.caption else None
+    kind = media_kind(m)
+    if job['mode'] == 'cached':
+        kind, src = job['cached']['kind'], job['cached']['file_id']
+    elif job['mode'] == 'direct':
+        src = getattr(m, kind).file_id
+    else:
+        src = job['f']
+    local = job['mode'] == 'file'
+    if kind == 'photo':
+        return InputMediaPhoto(src, caption=cap)
+    if kind == 'video':
+        if not local: return InputMediaVideo(src, caption=cap)
+        mtd = job.get('meta') or await video_meta(None, m, src, d)
+        return InputMediaVideo(src, thumb=mtd['thumb'], caption=cap,
+                               width=mtd['width'], height=mtd['height'], duration=mtd['duration'], supports_streaming=True)
+    if kind == 'audio':
+        return InputMediaAudio(src, thumb=thumbnail(d) if local else None, caption=cap)
+    return InputMediaDocument(src, thumb=thumbnail(d) if local else None, caption=cap)
+
+async def deliver_part(c, job):
+    m = job['m']
+    if job['mode'] == 'file':
+        job['p'] = await c.send_message(job['d'], 'Uploading...')
+        return await upload_file(c, job)
+    ok = await send_direct(c, m, job['tcid'], job.get('ft') if m.caption else None, job['rtmid'], cached=job.get('cached'))
+    return 'Sent.' if ok else 'Failed.'
+
+# what the album came to, from the per-part outcomes in album['results'] and the parts' errors
+def album_result(album, errors):
+    if not errors: return 'Done (album).'
+    ok = sum(album['results'].values())
+    detail = '; '.join(f'{mid}: {err}' for mid, err in errors.items())[:200]
+    return f'Album partly sent ({ok}/{len(album["results"])}) - {detail}' if ok else f'Failed. {detail}'
+
+# album['results'] ends up with a delivered flag per message id, for the batch to count parts by
+async def deliver_group(c, album):
+    d, p = album['d'], album['p']
+    parts = list(zip(album['ms'], album['jobs']))
+    album['results'] = {m.id: False for m, _ in parts}
+    jobs = [j for _, j in parts if isinstance(j, dict)]
+    errors = {m.id: j or 'Failed.' for m, j in parts if not isinstance(j, dict)}
+    files = [j['f'] for j in jobs if j.get('f')]
+    if not jobs:
+        res = album_result(album, errors)
+        await c.edit_message_text(d, p.id, res[:100])
+        return res
+    try:
+        try:
+            # a bot can't put a part over 2GB into an album
+            if any(os.path.getsize(f) > 2 * 1024 ** 3 for f in files): raise ValueError('part over 2GB')
+            await c.edit_message_text(d, p.id, 'Uploading album...')
+            media = [await album_media(c, j) for j in jobs]
+            sent = await c.send_media_group(jobs[0]['tcid'], media, reply_to_message_id=jobs[0]['rtmid'])
+        except Exception as e:
+            print(f'Album send failed, sending parts one by one: {e}')
+            for j in jobs:
+                r = await deliver_part(c, j)
+                album['results'][j['m'].id] = 'Done' in r or 'Sent' in r
+                if not album['results'][j['m'].id]: errors[j['m'].id] = r
+            await c.delete_messages(d, p.id)
+            return album_result(album, errors)
+        for j, out in zip(jobs, sent):
+            album['results'][j['m'].id] = True
+            if j['mode'] == 'file': await remember_upload(c, j['m'], out, j.get('fp'))
+        await c.delete_messages(d, p.id)
+        return album_result(album, errors)
+    finally:
+        for j in jobs:
+            if j.get('f'): discard(j)
+
+async def process_msg(c, u, m, d, lt, uid, i):
+    if m and m.media_group_id:
+        group = await get_group(c, u, i, m)
+        if len(group) > 1:
+            return await deliver_msg(c, await prepare_group(c, u, group, d, lt, uid, i))
+    return await deliver_msg(c, await prepare_msg(c, u, m, d, lt, uid, i))
         
 @X.on_message(filters.command(['batch', 'single']))
 async def process_cmd(c, m):
@@ -402,7 +775,8 @@ async def process_cmd(c, m):
     pro = await m.reply_text('Doing some checks hold on...')
     
     if is_user_active(uid):
-        await pro.edit('You have an active task. Use /stop to cancel it.')
+        job = JOBS.get(uid)
+        await pro.edit(f'You have an active task{f" ({job.kind} `{job.id}`, {job.state})" if job else ""}. Use /stop to cancel it.')
         return
     
     ubot = await get_ubot(uid)
@@ -416,24 +790,129 @@ async def process_cmd(c, m):
 @X.on_message(filters.command(['cancel', 'stop']))
 async def cancel_cmd(c, m):
     uid = m.from_user.id
-    if is_user_active(uid):
-        if await request_batch_cancel(uid):
-            await m.reply_text('Cancellation requested. The current batch will stop after the current download completes.')
-        else:
-            await m.reply_text('Failed to request cancellation. Please try again.')
+    job = JOBS.get(uid)
+    if job:
+        JOBS.cancel(uid)
+        await remove_active_batch(uid)
+        await m.reply_text(f'Cancelled {job.kind} `{job.id}`.')
+    elif get_batch_info(uid):
+        await remove_active_batch(uid)
+        await m.reply_text('Discarded your interrupted batch.')
     else:
         await m.reply_text('No active batch process found.')
 
+async def run_single(uid, did, pt, ubot, uc, i, s, lt):
+    pacer = Pacer()
+    pc, pu = pacer.wrap(ubot), pacer.wrap(uc)
+    SCHED.register(uid, await is_premium_user(uid))
+    try:
+        msg = await get_msg(pc, pu, i, s, lt)
+        if msg:
+            res = await process_msg(pc, pu, msg, did, lt, uid, i)
+            await pt.edit(f'1/1: {res}')
+        else:
+            await pt.edit('Message not found')
+    except asyncio.CancelledError:
+        try: await pt.edit('Cancelled.')
+        except: pass
+        raise
+    except Exception as e:
+        await pt.edit(f'Error: {str(e)[:50]}')
+    finally:
+        SCHED.unregister(uid)
+        WORKSPACE.close(uid)
+
+# s is the first message id still to fetch, n how many remain; done/success carry over from a checkpoint
+async def run_batch(uid, did, pt, ubot, uc, i, s, n, lt, done=0, success=0):
+    total = done + n
+    last_edit = 0
+    pacer = Pacer()
+    pc, pu = pacer.wrap(ubot), pacer.wrap(uc)
+    cfg = await get_user_settings(did)  # settings changed mid-batch apply from the next batch
+    
+    # an album goes through as one item at its first id; its other ids pass through as IN_ALBUM
+    async def msgs():
+        grouped = set()
+        async for msg in iter_msgs(pc, pu, i, int(s), n, lt):
+            if msg and msg.id in grouped:
+                yield IN_ALBUM
+            elif msg and msg.media_group_id:
+                group = await get_group(pc, pu, i, msg, int(s), int(s) + n)
+                grouped.update(g.id for g in group)
+                yield group if len(group) > 1 else msg
+            else:
+                yield msg
+    
+    async def download(msg):
+        if msg is IN_ALBUM: return msg
+        if isinstance(msg, list):
+            job = await prepare_group(pc, pu, msg, did, lt, uid, i, cfg)
+        else:
+            job = await prepare_msg(pc, pu, msg, did, lt, uid, i, cfg=cfg)
+        if isinstance(job, dict) and job['mode'] in ('file', 'album'):
+            pipe.stats['download'].add_bytes(job_bytes(job))
+        return job
+    
+    async def upload(job):
+        if job is IN_ALBUM: return job
+        pipe.stats['upload'].add_bytes(job_bytes(job))
+        res = await deliver_msg(pc, job)
+        if isinstance(job, dict): album_parts.update(job.get('results', {}))
+        await pacer.step()
+        return res
+    
+    album_parts = {}  # message id -> delivered, for every part of an album already sent
+    async def sink(j, res):
+        nonlocal success, last_edit
+        mid = int(s) + j  # iter_msgs yields one slot per id
+        if isinstance(res, Exception):
+            album_parts.pop(mid, None)
+            try: await pt.edit(f'{done+j+1}/{total}: Error - {str(res)[:30]}')
+            except: pass
+        elif res is IN_ALBUM:
+            success += album_parts.pop(mid, False)
+        else:
+            ok = bool(res) and ('Done' in res or 'Copied' in res or 'Sent' in res)
+            success += album_parts.pop(mid, ok)
+        await update_batch_progress(uid, done + j + 1, success, pipe.summary(), pacer.state(), int(s) + j + 1)
+        if time.time() - last_edit > 30:
+            last_edit = time.time()
+            try: await pt.edit(f'Processing batch... {done+j+1}/{total}\n✅ Success: {success}\n\n{pipe.summary()}\n{pacer.state()}\n🚦 {SCHED.state()}\n{PROGRESS.state()}\n{PROBE.state()}\n{FFMPEG.state()}\n{WORKSPACE.state()}')
+            except: pass
+    
+    pipe = Pipeline([
+        ('download', download),
+        ('upload', upload),
+    ], source='fetch')
+    
+    SCHED.register(uid, await is_premium_user(uid))
+    try:
+        await pipe.run(msgs(), sink)
+        await X.send_message(int(did), f'Batch Completed ✅ Success: {success}/{total}\n\n{pipe.summary()}')
+        await remove_active_batch(uid)
+    except asyncio.CancelledError:
+        try: await pt.edit(f'Cancelled. Success: {success}/{total}\n\n{pipe.summary()}')
+        except: pass
+        raise
+    except Exception as e:
+        # keep the checkpoint so the user can pick up from the last delivered item
+        cp = get_batch_info(uid)
+        if cp and 'next' in cp: await offer_resume(uid, cp, f'⚠️ Batch stopped: {str(e)[:50]}')
+        raise
+    finally:
+        SCHED.unregister(uid)
+        WORKSPACE.close(uid)  # pipeline tasks are done by now, nothing is still writing here
+
 @X.on_message(filters.text & filters.private & ~login_in_progress & ~filters.command([
     'start', 'batch', 'cancel', 'login', 'logout', 'stop', 'set', 
-    'pay', 'redeem', 'gencode', 'single', 'generate', 'keyinfo', 'encrypt', 'decrypt', 'keys', 'setbot', 'rembot']))
+    'pay', 'redeem', 'gencode', 'single', 'generate', 'keyinfo', 'encrypt', 'decrypt', 'keys', 'setbot', 'rembot', 'reencrypt']))
 async def text_handler(c, m):
     uid = m.from_user.id
     if uid not in Z: return
     s = Z[uid].get('step')
     x = await get_ubot(uid)
     if not x:
-        await message.reply("Add your bot /setbot `token`")
+        await m.reply("Add your bot /setbot `token`")
         return
 
     if s == 'start':
@@ -458,7 +937,7 @@ async def text_handler(c, m):
         i, s, lt = Z[uid]['cid'], Z[uid]['sid'], Z[uid]['lt']
         pt = await m.reply_text('Processing...')
         
-        ubot = UB.get(uid)
+        ubot = x
         if not ubot:
             await pt.edit('Add bot with /setbot first')
             Z.pop(uid, None)
@@ -475,17 +954,8 @@ async def text_handler(c, m):
             Z.pop(uid, None)
             return
 
-        try:
-            msg = await get_msg(ubot, uc, i, s, lt)
-            if msg:
-                res = await process_msg(ubot, uc, msg, str(m.chat.id), lt, uid, i)
-                await pt.edit(f'1/1: {res}')
-            else:
-                await pt.edit('Message not found')
-        except Exception as e:
-            await pt.edit(f'Error: {str(e)[:50]}')
-        finally:
-            Z.pop(uid, None)
+        JOBS.submit(uid, 'single', run_single(uid, str(m.chat.id), pt, ubot, uc, i, s, lt))
+        Z.pop(uid, None)
 
     elif s == 'count':
         if not m.text.isdigit():
@@ -501,11 +971,10 @@ async def text_handler(c, m):
 
         Z[uid].update({'step': 'process', 'did': str(m.chat.id), 'num': count})
         i, s, n, lt = Z[uid]['cid'], Z[uid]['sid'], Z[uid]['num'], Z[uid]['lt']
-        success = 0
 
         pt = await m.reply_text('Processing batch...')
         uc = await get_uclient(uid)
-        ubot = UB.get(uid)
+        ubot = x
         
         if not uc or not ubot:
             await pt.edit('Missing client setup')
@@ -517,43 +986,16 @@ async def text_handler(c, m):
             Z.pop(uid, None)
             return
         
+        job = JOBS.submit(uid, 'batch', run_batch(uid, str(m.chat.id), pt, ubot, uc, i, s, n, lt))
         await add_active_batch(uid, {
+            "job_id": job.id,
+            "cid": i,
+            "lt": lt,
+            "did": str(m.chat.id),
+            "next": int(s),
             "total": n,
             "current": 0,
             "success": 0,
-            "cancel_requested": False,
             "progress_message_id": pt.id
             })
-        
-        try:
-            for j in range(n):
-                
-                if should_cancel(uid):
-                    await pt.edit(f'Cancelled at {j}/{n}. Success: {success}')
-                    break
-                
-                await update_batch_progress(uid, j, success)
-                
-                mid = int(s) + j
-                
-                try:
-                    msg = await get_msg(ubot, uc, i, mid, lt)
-                    if msg:
-                        res = await process_msg(ubot, uc, msg, str(m.chat.id), lt, uid, i)
-                        if 'Done' in res or 'Copied' in res or 'Sent' in res:
-                            success += 1
-                    else:
-                        pass
-                except Exception as e:
-                    try: await pt.edit(f'{j+1}/{n}: Error - {str(e)[:30]}')
-                    except: pass
-                
-                await asyncio.sleep(10)
-            
-            if j+1 == n:
-                await m.reply_text(f'Batch Completed ✅ Success: {success}/{n}')
-        
-        finally:
-            await remove_active_batch(uid)
-            Z.pop(uid, None)
-
+        Z.pop(uid, None)
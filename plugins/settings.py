@@ -10,7 +10,7 @@ import string
 import random
 from shared_client import client as gf
 from config import OWNER_ID
-from utils.func import get_user_data_key, save_user_data, users_collection
+from utils.func import get_user_data_key, get_user_settings, save_user_data, users_collection, invalidate_user_settings, get_text_rules
 
 VIDEO_EXTENSIONS = {
     'mp4', 'mkv', 'avi', 'mov', 'wmv', 'flv', 'webm',
@@ -99,6 +99,7 @@ __👉 **Note:** if you are using custom bot then your bot should be admin that
             {'user_id': user_id},
             {'$unset': {'session_string': ''}}
         )
+        invalidate_user_settings(user_id)
         if result.modified_count > 0:
             await event.respond('Logged out and deleted session successfully.')
         else:
@@ -115,6 +116,7 @@ __👉 **Note:** if you are using custom bot then your bot should be admin that
                     'chat_id': ''
                 }}
             )
+            invalidate_user_settings(user_id)
             thumbnail_path = f'{user_id}.jpg'
             if os.path.exists(thumbnail_path):
                 os.remove(thumbnail_path)
@@ -230,40 +232,38 @@ def generate_random_name(length=7):
     return ''.join(random.choice(characters) for _ in range(length))
 
 
-async def rename_file(file, sender, edit):
-    try:
-        delete_words = await get_user_data_key(sender, 'delete_words', [])
-        custom_rename_tag = await get_user_data_key(sender, 'rename_tag', '')
-        replacements = await get_user_data_key(sender, 'replacement_words', {})
-        
-        last_dot_index = str(file).rfind('.')
-        if last_dot_index != -1 and last_dot_index != 0:
-            ggn_ext = str(file)[last_dot_index + 1:]
-            if ggn_ext.isalpha() and len(ggn_ext) <= 9:
-                if ggn_ext.lower() in VIDEO_EXTENSIONS:
-                    original_file_name = str(file)[:last_dot_index]
-                    file_extension = 'mp4'
-                else:
-                    original_file_name = str(file)[:last_dot_index]
-                    file_extension = ggn_ext
-            else:
+async def rename_name(file, sender, settings=None):
+    settings = settings or await get_user_settings(sender)
+    custom_rename_tag = settings.get('rename_tag', '')
+    
+    last_dot_index = str(file).rfind('.')
+    if last_dot_index != -1 and last_dot_index != 0:
+        ggn_ext = str(file)[last_dot_index + 1:]
+        if ggn_ext.isalpha() and len(ggn_ext) <= 9:
+            if ggn_ext.lower() in VIDEO_EXTENSIONS:
                 original_file_name = str(file)[:last_dot_index]
                 file_extension = 'mp4'
+            else:
+                original_file_name = str(file)[:last_dot_index]
+                file_extension = ggn_ext
         else:
-            original_file_name = str(file)
+            original_file_name = str(file)[:last_dot_index]
             file_extension = 'mp4'
-        
-        for word in delete_words:
-            original_file_name = original_file_name.replace(word, '')
-        
-        for word, replace_word in replacements.items():
-            original_file_name = original_file_name.replace(word, replace_word)
-        
-        new_file_name = f'{original_file_name} {custom_rename_tag}.{file_extension}'
-        
+    else:
+        original_file_name = str(file)
+        file_extension = 'mp4'
+    
+    original_file_name = get_text_rules(sender, settings).filename(original_file_name)
+    
+    return f'{original_file_name} {custom_rename_tag}.{file_extension}'
+
+
+async def rename_file(file, sender, edit, settings=None):
+    try:
+        # only the name changes; the rules never touch the directory it sits in
+        new_file_name = os.path.join(os.path.dirname(file), await rename_name(os.path.basename(file), sender, settings))
         os.rename(file, new_file_name)
         return new_file_name
     except Exception as e:
         print(f"Rename error: {e}")
         return file
-        
@@ -6,6 +6,8 @@ from datetime import timedelta, datetime
 from shared_client import client as bot_client
 from telethon import events
 from utils.func import get_premium_details, is_private_chat, get_display_name, get_user_data, premium_users_collection, is_premium_user
+from utils.func import reencrypt_sessions
+from utils.encrypt import KEYS
 from config import OWNER_ID
 import logging
 logging.basicConfig(format=
@@ -175,4 +177,22 @@ async def remove_premium_handler(event):
     except Exception as e:
         logger.error(f'Error removing premium from {target_user_id}: {e}')
         await event.respond(f'❌ Error removing premium: {str(e)}')
-        return
\ No newline at end of file
+        return
+
+
+@bot_client.on(events.NewMessage(pattern='/reencrypt'))
+async def reencrypt_handler(event):
+    """Rewrite stored session strings under the current key version (owner only)"""
+    if not await is_private_chat(event):
+        return
+    if event.sender_id not in OWNER_ID:
+        return
+    msg = await event.respond(f'🔐 Re-encrypting sessions with key v{KEYS.current}...')
+    try:
+        rotated, current, failed = await reencrypt_sessions()
+        await msg.edit(
+            f'✅ Re-encryption finished.\n\n🔁 Rotated: {rotated}\n✔️ Already current: {current}\n❌ Unreadable: {failed}'
+            )
+    except Exception as e:
+        logger.error(f'Error re-encrypting sessions: {e}')
+        await msg.edit(f'❌ Error re-encrypting sessions: {str(e)}')
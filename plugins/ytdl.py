@@ -28,6 +28,9 @@ from telethon import events
 from telethon.sync import TelegramClient
 from telethon.tl.types import DocumentAttributeVideo
 from utils.func import get_video_metadata, screenshot
+from utils.progress import PROGRESS
+from utils.ffmpeg import FFMPEG
+from utils.workspace import WORKSPACE
 from telethon.tl.functions.messages import EditMessageRequest
 from devgagantools import fast_upload
 from concurrent.futures import ThreadPoolExecutor
@@ -89,7 +92,8 @@ async def process_audio(client, event, url, cookies_env_var=None):
             temp_cookie_path = temp_cookie_file.name
  
     start_time = time.time()
-    random_filename = f"@team_spy_pro_{event.sender_id}"
+    ws = WORKSPACE.open(f"adl{event.sender_id}")
+    random_filename = ws.path(f"@team_spy_pro_{event.sender_id}")
     download_path = f"{random_filename}.mp3"
  
     ydl_opts = {
@@ -105,7 +109,7 @@ async def process_audio(client, event, url, cookies_env_var=None):
     progress_message = await event.reply("**__Starting audio extraction...__**")
  
     try:
-         
+        await ws.admit(0)  # size unknown until extracted, but the volume must have its headroom
         info_dict = await extract_audio_async(ydl_opts, url)
         title = info_dict.get('title', 'Extracted Audio')
  
@@ -125,7 +129,7 @@ async def process_audio(client, event, url, cookies_env_var=None):
  
                 thumbnail_url = info_dict.get('thumbnail')
                 if thumbnail_url:
-                    thumbnail_path = os.path.join(tempfile.gettempdir(), "thumb.jpg")
+                    thumbnail_path = ws.path("thumb.jpg")
                     asyncio.run(download_thumbnail_async(thumbnail_url, thumbnail_path))
                     with open(thumbnail_path, 'rb') as img:
                         audio_file.tags["APIC"] = APIC(
@@ -159,8 +163,7 @@ async def process_audio(client, event, url, cookies_env_var=None):
         logger.exception("Error during audio extraction or upload")
         await event.reply(f"**__An error occurred: {e}__**")
     finally:
-        if os.path.exists(download_path):
-            os.remove(download_path)
+        ws.close()
         if temp_cookie_path and os.path.exists(temp_cookie_path):
             os.remove(temp_cookie_path)
  
@@ -321,8 +324,9 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
         cookies = cookies_env_var
  
      
+    ws = WORKSPACE.open(f"dl{event.sender_id}")
     random_filename = get_random_string() + ".mp4"
-    download_path = os.path.abspath(random_filename)
+    download_path = ws.path(random_filename)
     logger.info(f"Generated random download path: {download_path}")
  
      
@@ -352,6 +356,7 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
         info_dict = await fetch_video_info(url, ydl_opts, progress_message, check_duration_and_size)
         if not info_dict:
             return
+        await ws.admit(info_dict.get('filesize') or info_dict.get('filesize_approx') or 0)
          
         await asyncio.to_thread(download_video, url, ydl_opts)
         title = info_dict.get('title', 'Powered by Team SPY')
@@ -360,17 +365,17 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
         H = k['height']
         D = k['duration']
         metadata['width'] = int(info_dict.get('width') or W or 0)
-metadata['height'] = int(info_dict.get('height') or H or 0)
-metadata['duration'] = int(info_dict.get('duration') or D or 0)
+        metadata['height'] = int(info_dict.get('height') or H or 0)
+        metadata['duration'] = int(info_dict.get('duration') or D or 0)
 
         THUMB = None
  
          
+        thumbnail_url = info_dict.get('thumbnail')
         if thumbnail_url:
-            thumbnail_file = os.path.join(tempfile.gettempdir(), get_random_string() + ".jpg")
-            downloaded_thumb = d_thumbnail(thumbnail_url, thumbnail_file)
-            if downloaded_thumb:
-                logger.info(f"Thumbnail saved at: {downloaded_thumb}")
+            thumbnail_file = d_thumbnail(thumbnail_url, ws.path(get_random_string() + ".jpg"))
+            if thumbnail_file:
+                logger.info(f"Thumbnail saved at: {thumbnail_file}")
  
         if thumbnail_file:
             THUMB = thumbnail_file
@@ -394,14 +399,14 @@ metadata['duration'] = int(info_dict.get('duration') or D or 0)
                 reply=prog,
                 progress_bar_function=lambda done, total: progress_callback(done, total, chat_id)
             ) 
-         ext = os.path.splitext(download_path)[1].lower()
-video_ext = ['.mp4', '.mkv', '.webm', '.mov', '.avi']
-audio_ext = ['.mp3', '.m4a', '.aac', '.wav']
-doc_ext = ['.pdf', '.txt', '.zip', '.rar', '.html', '.json']
+            ext = os.path.splitext(download_path)[1].lower()
+            video_ext = ['.mp4', '.mkv', '.webm', '.mov', '.avi']
+            audio_ext = ['.mp3', '.m4a', '.aac', '.wav']
+            doc_ext = ['.pdf', '.txt', '.zip', '.rar', '.html', '.json']
 
-is_video = ext in video_ext
-is_audio = ext in audio_ext
-is_doc = ext in doc_ext
+            is_video = ext in video_ext
+            is_audio = ext in audio_ext
+            is_doc = ext in doc_ext
 
             await client.send_file(
                 event.chat_id,
@@ -426,12 +431,10 @@ is_doc = ext in doc_ext
         await event.reply(f"**__An error occurred: {e}__**")
     finally:
          
-        if os.path.exists(download_path):
-            os.remove(download_path)
+        FFMPEG.drop(download_path)
+        ws.close()  # the video, its thumbnails and any split parts
         if temp_cookie_path and os.path.exists(temp_cookie_path):
             os.remove(temp_cookie_path)
-        if thumbnail_file and os.path.exists(thumbnail_file):
-            os.remove(thumbnail_file)
  
 
 async def split_and_upload_file(app, sender, file_path, caption):
@@ -510,30 +513,27 @@ async def progress_bar(current: int, total: int, ud_type: str, message, start: f
     now = time.time()
     diff = now - start
     
-    if round(diff % 10) == 0 or current == total:
-        percentage = (current * 100) / total
-        speed = current / diff if diff else 0
-        elapsed_time = round(diff * 1000)
-        time_to_completion = round((total - current) / speed) * 1000 if speed else 0
-        estimated_total_time = elapsed_time + time_to_completion
+    percentage = (current * 100) / total
+    speed = current / diff if diff else 0
+    elapsed_time = round(diff * 1000)
+    time_to_completion = round((total - current) / speed) * 1000 if speed else 0
+    estimated_total_time = elapsed_time + time_to_completion
 
-        elapsed_time_str = TimeFormatter(elapsed_time)
-        estimated_total_time_str = TimeFormatter(estimated_total_time)
+    elapsed_time_str = TimeFormatter(elapsed_time)
+    estimated_total_time_str = TimeFormatter(estimated_total_time)
 
-        progress = "".join(["♦" for _ in range(math.floor(percentage / 10))]) + \
-                   "".join(["◇" for _ in range(10 - math.floor(percentage / 10))])
-        
-        progress_text = progress + PROGRESS_BAR.format(
-            round(percentage, 2),
-            humanbytes(current),
-            humanbytes(total),
-            humanbytes(speed),
-            estimated_total_time_str if estimated_total_time_str else "0 s"
-        )
-        try:
-            await message.edit(text=f"{ud_type}\n│ {progress_text}")
-        except:
-            pass
+    progress = "".join(["♦" for _ in range(math.floor(percentage / 10))]) + \
+               "".join(["◇" for _ in range(10 - math.floor(percentage / 10))])
+    
+    progress_text = progress + PROGRESS_BAR.format(
+        round(percentage, 2),
+        humanbytes(current),
+        humanbytes(total),
+        humanbytes(speed),
+        estimated_total_time_str if estimated_total_time_str else "0 s"
+    )
+    # edits go out through PROGRESS at a bounded rate, never from inside the upload callback
+    PROGRESS.update(message._client, message.chat.id, message.id, f"{ud_type}\n│ {progress_text}")
 
 def humanbytes(size: int) -> str:
     """
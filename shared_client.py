@@ -5,6 +5,8 @@
 from telethon import TelegramClient
 from config import API_ID, API_HASH, BOT_TOKEN, STRING
 from pyrogram import Client
+from utils.func import load_peers
+from utils.transfer import use_parallel_upload
 import sys
 
 client = TelegramClient("telethonbot", API_ID, API_HASH)
@@ -18,6 +20,8 @@ async def start_client():
     if STRING:
         try:
             await userbot.start()
+            await load_peers(userbot)
+            use_parallel_upload(userbot)
             print("Userbot started...")
         except Exception as e:
             print(f"Hey honey!! check your premium string session, it may be invalid of expire {e}")
@@ -0,0 +1,44 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import time
+from config import CHAT_CACHE_TTL
+from utils.pacing import client_key
+
+
+class ChatCache:
+    """
+    Remembers how a source chat was reached: the peer id that worked, whether
+    the bot or the user client can read it, and whether its content is protected.
+    Keyed by the (bot, user client, source identifier) triple from a link.
+    """
+
+    def __init__(self, ttl=CHAT_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+
+    def _key(self, c, u, src):
+        return client_key(c), client_key(u), str(src)
+
+    def get(self, c, u, src):
+        key = self._key(c, u, src)
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry['at'] > self.ttl:
+            self._entries.pop(key, None)
+            return None
+        return entry
+
+    def put(self, c, u, src, peer, reader, protected=False):
+        self._entries[self._key(c, u, src)] = {
+            'peer': peer,
+            'reader': reader,
+            'protected': protected,
+            'at': time.monotonic(),
+        }
+
+    def invalidate(self, c, u, src):
+        self._entries.pop(self._key(c, u, src), None)
+
+
+CHATS = ChatCache()
@@ -0,0 +1,95 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from config import CLIENT_POOL_SIZE, CLIENT_IDLE_TIMEOUT
+from utils.jobs import JOBS
+from utils.transfer import close_sessions
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    """
+    Started per-user clients keyed by (kind, user id), at most `max_size`
+    live at once. The least recently used client is stopped to make room and
+    any client idle for `idle` seconds is stopped by `run`, but never while
+    its user has an active job. Concurrent `get` calls for a missing key
+    share one start.
+    """
+
+    def __init__(self, max_size=CLIENT_POOL_SIZE, idle=CLIENT_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle = idle
+        self.clients = OrderedDict()  # key -> (client, last used)
+        self._starting = {}
+
+    def busy(self, key):
+        return JOBS.get(key[1]) is not None
+
+    def peek(self, key):
+        entry = self.clients.get(key)
+        if not entry:
+            return None
+        self.clients[key] = (entry[0], time.monotonic())
+        self.clients.move_to_end(key)
+        return entry[0]
+
+    async def get(self, key, start):
+        """Return the live client for `key`, or start one with `start()` (which may return None)."""
+        client = self.peek(key)
+        if client:
+            return client
+        task = self._starting.get(key)
+        if not task:
+            task = self._starting[key] = asyncio.create_task(self._start(key, start))
+        # shielded so one caller giving up doesn't cancel the start for the others
+        return await asyncio.shield(task)
+
+    async def _start(self, key, start):
+        try:
+            client = await start()
+            if client:
+                self.clients[key] = (client, time.monotonic())
+                await self._shrink(keep=key[1])
+            return client
+        finally:
+            self._starting.pop(key, None)
+
+    async def _shrink(self, keep=None):
+        # the user whose client was just started has no job yet, so never evict their clients here
+        idle = [k for k in self.clients if k[1] != keep and not self.busy(k)]
+        while len(self.clients) > self.max_size and idle:
+            await self.drop(idle.pop(0))
+        if len(self.clients) > self.max_size:
+            logger.warning(f"Client pool over its limit: {len(self.clients)}/{self.max_size}, nothing idle to stop")
+
+    async def drop(self, key):
+        entry = self.clients.pop(key, None)
+        if not entry:
+            return
+        try:
+            await close_sessions(entry[0])
+            await entry[0].stop()
+        except Exception as e:
+            logger.warning(f"Error stopping client {key}: {e}")
+
+    async def run(self, interval=60):
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for key, (client, used) in list(self.clients.items()):
+                if self.busy(key):
+                    self.clients[key] = (client, now)  # idle time counts from the end of the job
+                elif used < now - self.idle:
+                    await self.drop(key)
+
+    def state(self):
+        return f'🔌 clients: {len(self.clients)}/{self.max_size}'
+
+
+CLIENTS = ClientPool()
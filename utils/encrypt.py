@@ -4,7 +4,9 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC as PBK
 from cryptography.hazmat.primitives.ciphers import Cipher as Cp, algorithms as alg, modes as md
 import base64 as b64
 import os as osy
-from config import MASTER_KEY as M1, IV_KEY as I1
+import asyncio
+import threading
+from config import MASTER_KEY as M1, IV_KEY as I1, KEY_VERSION as KV, OLD_KEYS as OK
 
 def dyk(pwd=M1, slt=I1, l=16):
     pw = pwd.encode()
@@ -17,24 +19,69 @@ def dyk(pwd=M1, slt=I1, l=16):
     )
     return kdf.derive(pw)
 
+
+class KeyRing:
+    """
+    Session-encryption keys by version. Each key is derived once and kept;
+    `warm` derives them all in a worker thread so nothing on the event loop
+    pays for PBKDF2. New ciphertexts are tagged `v<version>:`; untagged ones
+    are version 1, the format written before versions existed.
+    """
+
+    def __init__(self, current=KV, master=M1, salt=I1, old=OK):
+        self.current = current
+        self.secrets = {current: (master, salt)}
+        for item in filter(None, (old or '').split(',')):
+            ver, pair = item.split('=', 1)
+            self.secrets.setdefault(int(ver), tuple(pair.split(':', 1)))
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def key(self, ver):
+        k = self._keys.get(ver)
+        if k is None:
+            with self._lock:
+                k = self._keys.get(ver)
+                if k is None:
+                    k = self._keys[ver] = dyk(*self.secrets[ver])
+        return k
+
+    def ready(self, ver):
+        return ver in self._keys
+
+    async def warm(self):
+        await asyncio.to_thread(lambda: [self.key(v) for v in self.secrets])
+
+    def version(self, ed):
+        head, sep, _ = ed.partition(':')
+        return int(head[1:]) if sep and head.startswith('v') else 1
+
+    def encrypt(self, s):
+        n = osy.urandom(12)
+        enc = Cp(alg.AES(self.key(self.current)), md.GCM(n)).encryptor()
+        ct = enc.update(s.encode()) + enc.finalize()
+        return f'v{self.current}:' + b64.b64encode(n + enc.tag + ct).decode()
+
+    def decrypt(self, ed):
+        ver = self.version(ed)
+        dat = b64.b64decode(ed.partition(':')[2] if ':' in ed else ed)
+        dec = Cp(alg.AES(self.key(ver)), md.GCM(dat[:12], dat[12:28])).decryptor()
+        return (dec.update(dat[28:]) + dec.finalize()).decode()
+
+
+KEYS = KeyRing()
+
 def ecs(s):
-    k = dyk()
-    n = osy.urandom(12) 
-    cp = Cp(alg.AES(k), md.GCM(n))
-    enc = cp.encryptor()
-    p = s.encode()
-    ct = enc.update(p) + enc.finalize()
-    tg = enc.tag
-    encd = b64.b64encode(n + tg + ct).decode()
-    return encd
+    return KEYS.encrypt(s)
 
 def dcs(ed):
-    k = dyk()
-    dat = b64.b64decode(ed.encode())
-    n = dat[:12]
-    tg = dat[12:28]
-    ct = dat[28:]
-    cp = Cp(alg.AES(k), md.GCM(n, tg))
-    dec = cp.decryptor()
-    res = dec.update(ct) + dec.finalize()
-    return res.decode()
+    return KEYS.decrypt(ed)
+
+# async callers go through these so a cold key is derived off the loop
+async def aecs(s):
+    if not KEYS.ready(KEYS.current): await KEYS.warm()
+    return ecs(s)
+
+async def adcs(ed):
+    if not KEYS.ready(KEYS.version(ed)): await KEYS.warm()
+    return dcs(ed)
@@ -0,0 +1,140 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from config import FFMPEG_WORKERS, FFMPEG_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# containers with a seek index, where -ss before -i lands on the frame without decoding up to it
+FAST_SEEK_EXTS = {'.mp4', '.m4v', '.mov', '.mkv', '.webm', '.3gp'}
+
+
+class FFmpegPool:
+    """
+    Every ffmpeg run in the process goes through here, at most `workers` at
+    a time, ffprobe included. Thumbnails get a unique output name and are cached per source
+    file (path, size, mtime); `drop` deletes a file's thumbnail once the file
+    itself is gone.
+    """
+
+    def __init__(self, workers=FFMPEG_WORKERS, timeout=FFMPEG_TIMEOUT, cache_size=64):
+        self.sem = asyncio.Semaphore(workers)
+        self.workers = workers
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.thumbs = OrderedDict()  # realpath -> (size, mtime, thumbnail path)
+        self._inflight = {}
+        self.waiting = self.running = self.runs = 0
+
+    async def run(self, *args, tool='ffmpeg'):
+        """Run ffmpeg (or ffprobe) with `args`; returns (returncode, stdout, stderr)."""
+        self.waiting += 1
+        try:
+            await self.sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                tool, '-hide_banner', '-loglevel', 'error', *args,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                out, err = await asyncio.wait_for(proc.communicate(), self.timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                proc.kill()
+                await proc.wait()
+                raise
+            return proc.returncode, out, err.decode(errors='replace').strip()
+        finally:
+            self.running -= 1
+            self.runs += 1
+            self.sem.release()
+
+    async def thumbnail(self, video, duration, prefix='thumb'):
+        key = os.path.realpath(video)
+        st = os.stat(video)
+        hit = self.thumbs.get(key)
+        if hit and hit[:2] == (st.st_size, st.st_mtime_ns) and os.path.exists(hit[2]):
+            self.thumbs.move_to_end(key)
+            return hit[2]
+        task = self._inflight.get(key)
+        if not task:
+            task = self._inflight[key] = asyncio.create_task(self._thumbnail(key, video, duration, prefix, st))
+        return await asyncio.shield(task)
+
+    async def _thumbnail(self, key, video, duration, prefix, st):
+        out = os.path.join(os.path.dirname(key), f"{prefix}_{uuid.uuid4().hex[:12]}.jpg")  # goes away with the video's workspace
+        ts = time.strftime('%H:%M:%S', time.gmtime((duration or 0) // 2))
+        if os.path.splitext(video)[1].lower() in FAST_SEEK_EXTS:
+            args = ['-ss', ts, '-i', video]
+        else:
+            args = ['-i', video, '-ss', ts]  # no index to jump with, decode up to the frame instead
+        try:
+            _, _, err = await self.run(*args, '-an', '-sn', '-frames:v', '1', '-y', out)
+        except (asyncio.TimeoutError, OSError) as e:
+            err = str(e) or 'timed out'
+        finally:
+            self._inflight.pop(key, None)
+        if not os.path.isfile(out):
+            print(f"FFmpeg Error: {err}")
+            return None
+        self._forget(key)
+        self.thumbs[key] = (st.st_size, st.st_mtime_ns, out)
+        while len(self.thumbs) > self.cache_size:
+            self._remove(self.thumbs.popitem(last=False)[1][2])
+        return out
+
+    async def probe(self, video):
+        """Width, height and duration from ffprobe, for containers the header parser doesn't read."""
+        try:
+            code, out, err = await self.run(
+                '-select_streams', 'v:0', '-show_entries', 'stream=width,height:format=duration',
+                '-of', 'json', video, tool='ffprobe'
+            )
+            info = json.loads(out or b'{}')
+            stream = (info.get('streams') or [{}])[0]
+            width, height = int(stream.get('width') or 0), int(stream.get('height') or 0)
+            duration = round(float(info.get('format', {}).get('duration') or 0))
+        except (asyncio.TimeoutError, OSError, ValueError) as e:
+            logger.error(f"ffprobe failed on {video}: {e}")
+            return None
+        if code or not width or not height or duration <= 0:
+            return None
+        return {'width': width, 'height': height, 'duration': duration}
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _forget(self, key):
+        hit = self.thumbs.pop(key, None)
+        if hit:
+            self._remove(hit[2])
+
+    def adopt(self, video, thumb):
+        """Treat `thumb` (made elsewhere) as the cached thumbnail of `video`."""
+        st = os.stat(video)
+        key = os.path.realpath(video)
+        if self.thumbs.get(key, (0, 0, None))[2] != thumb:
+            self._forget(key)
+        self.thumbs[key] = (st.st_size, st.st_mtime_ns, thumb)
+
+    def drop(self, video):
+        self._forget(os.path.realpath(video))
+
+    def state(self):
+        return f'🎬 ffmpeg: {self.running}/{self.workers} running (+{self.waiting} queued) · {len(self.thumbs)} thumbs cached'
+
+
+FFMPEG = FFmpegPool()
@@ -2,16 +2,22 @@
 # Licensed under the GNU General Public License v3.0.  
 # See LICENSE file in the repository root for full license text.
 
-import concurrent.futures
+import copy
+import hashlib
 import time
 import os
 import re
-import cv2
 import logging
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+from collections import OrderedDict
 from motor.motor_asyncio import AsyncIOMotorClient
-from config import MONGO_DB as MONGO_URI, DB_NAME
+from pymongo import UpdateOne
+from config import MONGO_DB as MONGO_URI, DB_NAME, MEDIA_CACHE_DAYS, SETTINGS_CACHE_SIZE, SETTINGS_CACHE_TTL
+from utils.encrypt import KEYS, aecs, adcs
+from utils.probe import PROBE
+from utils.ffmpeg import FFMPEG
 
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,6 +32,68 @@ users_collection = db["users"]
 premium_users_collection = db["premium_users"]
 statistics_collection = db["statistics"]
 codedb = db["redeem_code"]
+peers_collection = db["peers"]
+media_cache_collection = db["media_cache"]
+_user_settings = OrderedDict()  # user_id -> (user document, loaded at), LRU, dropped by every writer below
+_user_rules = OrderedDict()  # user_id -> (replacement_words, delete_words, TextRules) they were compiled from
+
+# every index the bot relies on: (collection, keys, options, a query it has to serve)
+INDEXES = [
+    (users_collection, [("user_id", 1)], {"unique": True}, {"user_id": 0}),
+    (premium_users_collection, [("user_id", 1)], {"unique": True}, {"user_id": 0}),
+    (premium_users_collection, [("expireAt", 1)], {"expireAfterSeconds": 0}, None),
+    (codedb, [("code", 1)], {"unique": True, "sparse": True}, {"code": ""}),
+    (peers_collection, [("session", 1), ("id", 1)], {"unique": True}, {"session": 0}),
+    (media_cache_collection, [("bot", 1), ("unique_id", 1)], {"unique": True}, {"bot": 0, "unique_id": ""}),
+    (media_cache_collection, [("expireAt", 1)], {"expireAfterSeconds": 0}, None),
+]
+
+
+def _scans(plan):
+    """Stages of an explain() plan that read the whole collection."""
+    if not isinstance(plan, dict):
+        return []
+    found = [plan["stage"]] if plan.get("stage") == "COLLSCAN" else []
+    for key in ("inputStage", "queryPlan"):
+        found += _scans(plan.get(key))
+    for child in plan.get("inputStages", []):
+        found += _scans(child)
+    return found
+
+
+async def ensure_indexes():
+    """
+    Create every index in INDEXES once at startup, then explain each hot
+    query and log any that would still scan its whole collection. A unique
+    index that existing duplicates block is created as a plain one so
+    lookups are fast anyway, and the duplicates are reported.
+    """
+    for coll, keys, opts, _ in INDEXES:
+        try:
+            await coll.create_index(keys, **opts)
+        except Exception as e:
+            if not opts.get("unique"):
+                logger.error(f"Cannot create index {keys} on {coll.name}: {e}")
+                continue
+            logger.error(f"Unique index {keys} on {coll.name} failed (duplicates?), using a non-unique one: {e}")
+            try:
+                await coll.create_index(keys, **{k: v for k, v in opts.items() if k != "unique"})
+            except Exception as e:
+                logger.error(f"Cannot create index {keys} on {coll.name}: {e}")
+    scans = 0
+    for coll, keys, _, query in INDEXES:
+        if query is None:
+            continue
+        try:
+            plan = (await coll.find(query).explain()).get("queryPlanner", {}).get("winningPlan")
+        except Exception as e:
+            logger.warning(f"Cannot explain {query} on {coll.name}: {e}")
+            continue
+        if _scans(plan):
+            scans += 1
+            logger.warning(f"Collection scan: {coll.name}.find({query}) does not use an index")
+    logger.info(f"Mongo indexes checked: {len(INDEXES)} declared, {scans} queries scanning")
+    return scans
 
 # ------- < start > Session Encoder don't change -------
 
@@ -107,13 +175,38 @@ async def save_user_data(user_id, key, value):
         {"$set": {key: value}},
         upsert=True
     )
+    invalidate_user_settings(user_id)
    # print(users_collection)
 
 
+def invalidate_user_settings(user_id):
+    _user_settings.pop(int(user_id), None)
+    _user_rules.pop(int(user_id), None)
+
+
+async def get_user_settings(user_id):
+    """
+    Read-only view of a user's document, served from memory until a write
+    through this module (or invalidate_user_settings) drops it, it is
+    SETTINGS_CACHE_TTL seconds old, or SETTINGS_CACHE_SIZE more recently
+    used users push it out. Take one per job and read every setting from it.
+    """
+    user_id = int(user_id)
+    hit = _user_settings.get(user_id)
+    if hit and time.monotonic() - hit[1] < SETTINGS_CACHE_TTL:
+        _user_settings.move_to_end(user_id)
+        return MappingProxyType(hit[0])
+    doc = await users_collection.find_one({"user_id": user_id}) or {}
+    _user_settings[user_id] = (doc, time.monotonic())
+    _user_settings.move_to_end(user_id)
+    while len(_user_settings) > SETTINGS_CACHE_SIZE:
+        invalidate_user_settings(next(iter(_user_settings)))
+    return MappingProxyType(doc)
+
+
 async def get_user_data_key(user_id, key, default=None):
-    user_data = await users_collection.find_one({"user_id": int(user_id)})
-  #  print(f"Fetching key '{key}' for user {user_id}: {user_data}")
-    return user_data.get(key, default) if user_data else default
+    # callers may modify what they get back, so never hand out the cached value itself
+    return copy.deepcopy((await get_user_settings(user_id)).get(key, default))
 
 
 async def get_user_data(user_id):
@@ -135,6 +228,7 @@ async def save_user_session(user_id, session_string):
             }},
             upsert=True
         )
+        invalidate_user_settings(user_id)
         logger.info(f"Saved session for user {user_id}")
         return True
     except Exception as e:
@@ -148,6 +242,7 @@ async def remove_user_session(user_id):
             {"user_id": user_id},
             {"$unset": {"session_string": ""}}
         )
+        invalidate_user_settings(user_id)
         logger.info(f"Removed session for user {user_id}")
         return True
     except Exception as e:
@@ -162,9 +257,10 @@ async def save_user_bot(user_id, bot_token):
             {"$set": {
                 "bot_token": bot_token,
                 "updated_at": datetime.now()
-            }},
+            }, "$unset": {"bot_session": ""}},
             upsert=True
         )
+        invalidate_user_settings(user_id)
         logger.info(f"Saved bot token for user {user_id}")
         return True
     except Exception as e:
@@ -176,8 +272,9 @@ async def remove_user_bot(user_id):
     try:
         await users_collection.update_one(
             {"user_id": user_id},
-            {"$unset": {"bot_token": ""}}
+            {"$unset": {"bot_token": "", "bot_session": ""}}
         )
+        invalidate_user_settings(user_id)
         logger.info(f"Removed bot token for user {user_id}")
         return True
     except Exception as e:
@@ -185,96 +282,227 @@ async def remove_user_bot(user_id):
         return False
 
 
-async def process_text_with_rules(user_id, text):
-    if not text:
-        return ""
-    
+def _token_id(bot_token):
+    return hashlib.sha256(bot_token.encode()).hexdigest()[:16]
+
+
+async def get_bot_session(user_id, bot_token):
+    """The session saved for this user's bot, if it was exported under `bot_token`."""
+    saved = await get_user_data_key(user_id, "bot_session")
+    if not saved or saved.get("token") != _token_id(bot_token):
+        return None
     try:
-        replacements = await get_user_data_key(user_id, "replacement_words", {})
-        delete_words = await get_user_data_key(user_id, "delete_words", [])
-        
-        processed_text = text
-        for word, replacement in replacements.items():
-            processed_text = processed_text.replace(word, replacement)
-        
-        if delete_words:
-            words = processed_text.split()
-            filtered_words = [w for w in words if w not in delete_words]
-            processed_text = " ".join(filtered_words)
-        
-        return processed_text
+        return await adcs(saved["session"])
     except Exception as e:
-        logger.error(f"Error processing text with rules: {e}")
-        return text
+        logger.warning(f"Cannot decrypt bot session of {user_id}: {e}")
+        return None
 
 
-async def screenshot(video: str, duration: int, sender: str) -> str | None:
-    existing_screenshot = f"{sender}.jpg"
-    if os.path.exists(existing_screenshot):
-        return existing_screenshot
+async def save_bot_session(user_id, bot_token, session_string):
+    # a bot client restarted from its session skips auth.ImportBotAuthorization, which Telegram flood-limits
+    try:
+        session = {"token": _token_id(bot_token), "session": await aecs(session_string)} if session_string else None
+        await users_collection.update_one(
+            {"user_id": user_id},
+            {"$set": {"bot_session": session}} if session else {"$unset": {"bot_session": ""}}
+        )
+        invalidate_user_settings(user_id)
+        return True
+    except Exception as e:
+        logger.error(f"Error saving bot session for user {user_id}: {e}")
+        return False
 
-    time_stamp = hhmmss(duration // 2)
-    output_file = datetime.now().isoformat("_", "seconds") + ".jpg"
-
-    cmd = [
-        "ffmpeg",
-        "-ss", time_stamp,
-        "-i", video,
-        "-frames:v", "1",
-        output_file,
-        "-y"
-    ]
-
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    
-    stdout, stderr = await process.communicate()
 
-    if os.path.isfile(output_file):
-        return output_file
-    else:
-        print(f"FFmpeg Error: {stderr.decode().strip()}")
+async def reencrypt_sessions():
+    """Rewrite every stored session_string under the current key version. Returns (rotated, current, failed)."""
+    await KEYS.warm()
+    rotated = current = failed = 0
+    ops, users = [], []
+    async for u in users_collection.find({"session_string": {"$exists": True}}, {"user_id": 1, "session_string": 1}):
+        old = u["session_string"]
+        if KEYS.version(old) == KEYS.current:
+            current += 1
+            continue
+        try:
+            new = KEYS.encrypt(KEYS.decrypt(old))
+        except Exception as e:
+            logger.warning(f"Cannot decrypt session of {u.get('user_id')}: {e}")
+            failed += 1
+            continue
+        # matching on the old value leaves a session the user replaced meanwhile alone
+        ops.append(UpdateOne({"_id": u["_id"], "session_string": old}, {"$set": {"session_string": new}}))
+        users.append(u.get("user_id"))
+    for k in range(0, len(ops), 500):
+        rotated += (await users_collection.bulk_write(ops[k:k + 500], ordered=False)).modified_count
+    for user_id in filter(None, users):
+        invalidate_user_settings(user_id)
+    return rotated, current, failed
+
+
+def _dump_peers(client, ids=None):
+    query = "SELECT id, access_hash, type, username, phone_number FROM peers"
+    if ids:
+        query += f" WHERE id IN ({','.join('?' * len(ids))})"
+    return client.storage.conn.execute(query, tuple(ids or ())).fetchall()
+
+
+async def save_peers(client, ids=None):
+    # persist peers from the client's in-memory session, keyed by the account that resolved them
+    try:
+        session = client.me.id
+        rows = _dump_peers(client, ids)
+        if rows:
+            await peers_collection.bulk_write([
+                UpdateOne(
+                    {"session": session, "id": peer_id},
+                    {"$set": {"access_hash": access_hash, "type": peer_type,
+                              "username": username, "phone_number": phone_number}},
+                    upsert=True
+                )
+                for peer_id, access_hash, peer_type, username, phone_number in rows
+            ], ordered=False)
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error saving peers: {e}")
+        return 0
+
+
+async def load_peers(client):
+    try:
+        rows = [
+            (p["id"], p["access_hash"], p["type"], p.get("username"), p.get("phone_number"))
+            async for p in peers_collection.find({"session": client.me.id})
+        ]
+        if rows:
+            await client.storage.update_peers(rows)
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error loading peers: {e}")
+        return 0
+
+
+def media_fingerprint(settings, sender):
+    """What a user's settings bake into an uploaded file: the renamed file name and the thumbnail."""
+    thumb = thumbnail(sender)
+    raw = repr((
+        settings.get("rename_tag"),
+        sorted((settings.get("replacement_words") or {}).items()),
+        sorted(settings.get("delete_words") or []),
+        os.path.getmtime(thumb) if thumb else None,
+    ))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+async def get_cached_media(bot_id, unique_id, fp=None):
+    # every hit pushes expiry out again, so entries that keep getting used never age out;
+    # an entry uploaded under other rename/thumbnail settings (fp) is a miss and gets overwritten
+    if MEDIA_CACHE_DAYS <= 0:
+        return None
+    try:
+        return await media_cache_collection.find_one_and_update(
+            {"bot": bot_id, "unique_id": unique_id, "fp": fp},
+            {"$set": {"expireAt": datetime.now(timezone.utc) + timedelta(days=MEDIA_CACHE_DAYS)}}
+        )
+    except Exception as e:
+        logger.error(f"Error reading media cache: {e}")
         return None
 
 
-async def get_video_metadata(file_path):
-    default_values = {'width': 1, 'height': 1, 'duration': 1}
-    loop = asyncio.get_event_loop()
-    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+async def cache_media(bot_id, unique_id, kind, file_id, fp=None):
+    if MEDIA_CACHE_DAYS <= 0:
+        return
+    try:
+        await media_cache_collection.update_one(
+            {"bot": bot_id, "unique_id": unique_id},
+            {"$set": {"kind": kind, "file_id": file_id, "fp": fp,
+                      "expireAt": datetime.now(timezone.utc) + timedelta(days=MEDIA_CACHE_DAYS)}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Error writing media cache: {e}")
+
+
+async def drop_cached_media(bot_id, unique_id):
+    try:
+        await media_cache_collection.delete_one({"bot": bot_id, "unique_id": unique_id})
+    except Exception as e:
+        logger.error(f"Error dropping media cache entry: {e}")
+
+
+class TextRules:
+    """
+    A user's replace and delete rules, compiled once. Each rule set is one
+    regex alternation of the literal words, longest first, applied in a
+    single pass, so a replacement never feeds another replacement. Filenames
+    go through the delete pass first, then the replace pass.
+    """
+
+    def __init__(self, replacements, delete_words):
+        replacements = {k: v for k, v in (replacements or {}).items() if k}
+        delete_words = [w for w in (delete_words or []) if w]
+        self.replace = self._compile(replacements)
+        self.drop = frozenset(delete_words)  # captions drop whole words
+        # filenames lose delete words anywhere in the name, then get the replacements
+        self.delete = self._compile(dict.fromkeys(delete_words, ''))
+
+    @staticmethod
+    def _compile(mapping):
+        if not mapping:
+            return None
+        pattern = re.compile('|'.join(map(re.escape, sorted(mapping, key=len, reverse=True))))
+        return lambda text: pattern.sub(lambda m: mapping[m.group()], text)
+
+    def caption(self, text):
+        if self.replace:
+            text = self.replace(text)
+        if self.drop:
+            text = " ".join(w for w in text.split() if w not in self.drop)
+        return text
+
+    def filename(self, name):
+        if self.delete:
+            name = self.delete(name)
+        if self.replace:
+            name = self.replace(name)
+        return name
+
+
+def get_text_rules(user_id, settings):
+    """Compiled rules for `settings`, reused while the user's settings stay cached."""
+    replacements, delete_words = settings.get("replacement_words"), settings.get("delete_words")
+    hit = _user_rules.get(int(user_id))
+    if hit and hit[0] is replacements and hit[1] is delete_words:
+        _user_rules.move_to_end(int(user_id))
+        return hit[2]
+    rules = TextRules(replacements, delete_words)
+    _user_rules[int(user_id)] = (replacements, delete_words, rules)
+    _user_rules.move_to_end(int(user_id))
+    while len(_user_rules) > SETTINGS_CACHE_SIZE:
+        _user_rules.popitem(last=False)
+    return rules
+
+
+async def process_text_with_rules(user_id, text, settings=None):
+    if not text:
+        return ""
     
     try:
-        def _extract_metadata():
-            try:
-                vcap = cv2.VideoCapture(file_path)
-                if not vcap.isOpened():
-                    return default_values
+        settings = settings or await get_user_settings(user_id)
+        return get_text_rules(user_id, settings).caption(text)
+    except Exception as e:
+        logger.error(f"Error processing text with rules: {e}")
+        return text
 
-                width = round(vcap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                height = round(vcap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                fps = vcap.get(cv2.CAP_PROP_FPS)
-                frame_count = vcap.get(cv2.CAP_PROP_FRAME_COUNT)
 
-                if fps <= 0:
-                    return default_values
+async def screenshot(video: str, duration: int, sender: str) -> str | None:
+    existing_screenshot = f"{sender}.jpg"
+    if os.path.exists(existing_screenshot):
+        return existing_screenshot
+    return await FFMPEG.thumbnail(video, duration, prefix=str(sender))
 
-                duration = round(frame_count / fps)
-                if duration <= 0:
-                    return default_values
 
-                vcap.release()
-                return {'width': width, 'height': height, 'duration': duration}
-            except Exception as e:
-                logger.error(f"Error in video_metadata: {e}")
-                return default_values
-        
-        return await loop.run_in_executor(executor, _extract_metadata)
-        
-    except Exception as e:
-        logger.error(f"Error in get_video_metadata: {e}")
-        return default_values
+async def get_video_metadata(file_path, unique_id=None):
+    return await PROBE.probe(file_path, unique_id)
 
 
 async def add_premium_user(user_id, duration_value, duration_unit):
@@ -310,8 +538,6 @@ async def add_premium_user(user_id, duration_value, duration_unit):
             upsert=True
         )
         
-        await premium_users_collection.create_index("expireAt", expireAfterSeconds=0)
-        
         return True, expiry_date
     except Exception as e:
         logger.error(f"Error adding premium user {user_id}: {e}")
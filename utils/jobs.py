@@ -0,0 +1,65 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import time
+import uuid
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, uid, kind):
+        self.id = uuid.uuid4().hex[:8]
+        self.uid = uid
+        self.kind = kind
+        self.state = 'queued'
+        self.created = time.time()
+        self.task = None
+
+    @property
+    def active(self):
+        return self.state in ('queued', 'running')
+
+
+class JobRunner:
+    """
+    Runs /batch and /single work as plain asyncio tasks so a long job never
+    holds one of the Pyrogram dispatcher workers. One active job per user.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+
+    def get(self, uid):
+        job = self.jobs.get(uid)
+        return job if job and job.active else None
+
+    def submit(self, uid, kind, coro):
+        job = Job(uid, kind)
+        self.jobs[uid] = job
+        job.task = asyncio.create_task(self._run(job, coro))
+        return job
+
+    async def _run(self, job, coro):
+        job.state = 'running'
+        try:
+            await coro
+            job.state = 'done'
+        except asyncio.CancelledError:
+            job.state = 'cancelled'
+        except Exception as e:
+            job.state = 'failed'
+            logger.error(f"Job {job.id} ({job.kind}) for {job.uid} failed: {e}")
+
+    def cancel(self, uid):
+        job = self.get(uid)
+        if not job:
+            return None
+        job.task.cancel()
+        return job
+
+
+JOBS = JobRunner()
@@ -0,0 +1,112 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import os
+import json
+import asyncio
+import logging
+from config import JOBSTORE_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """
+    Active batch entries kept in memory and persisted to an append-only
+    JSON-lines journal. Writes only mark keys dirty; `flush` appends one line
+    per changed key (a null value is a delete) off the event loop, and the
+    journal is rewritten from the live entries once it holds more than
+    `compact_ratio` lines per live entry.
+    """
+
+    def __init__(self, path, legacy_path=None, compact_ratio=4):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_ratio = compact_ratio
+        self.data = {}
+        self._dirty = set()
+        self._lines = 0
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash mid-append
+                    self._lines += 1
+                    if rec.get('v') is None:
+                        self.data.pop(rec['k'], None)
+                    else:
+                        self.data[rec['k']] = rec['v']
+        elif self.legacy_path and os.path.exists(self.legacy_path):
+            try:
+                with open(self.legacy_path, 'r') as f:
+                    self.data = json.load(f)
+                self._dirty.update(self.data)
+            except Exception as e:
+                logger.error(f"Error importing {self.legacy_path}: {e}")
+        if self._lines > self.compact_ratio * max(len(self.data), 1):
+            self._compact([json.dumps({'k': k, 'v': v}) for k, v in self.data.items()])
+        return self
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def items(self):
+        return list(self.data.items())
+
+    def put(self, key, value):
+        self.data[key] = value
+        self._dirty.add(key)
+
+    def update(self, key, **fields):
+        if key in self.data:
+            self.data[key].update(fields)
+            self._dirty.add(key)
+
+    def delete(self, key):
+        if self.data.pop(key, None) is not None:
+            self._dirty.add(key)
+
+    def _append(self, lines):
+        with open(self.path, 'a') as f:
+            f.write(''.join(line + '\n' for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self, lines):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(''.join(line + '\n' for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._lines = len(lines)
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        # serialise on the loop so the worker thread never sees a dict mid-update
+        lines = [json.dumps({'k': k, 'v': self.data.get(k)}) for k in keys]
+        try:
+            if self._lines + len(lines) > self.compact_ratio * max(len(self.data), 1):
+                snapshot = [json.dumps({'k': k, 'v': v}) for k, v in self.data.items()]
+                await asyncio.to_thread(self._compact, snapshot)
+            else:
+                await asyncio.to_thread(self._append, lines)
+                self._lines += len(lines)
+        except Exception as e:
+            self._dirty |= keys
+            logger.error(f"Error flushing job store: {e}")
+
+    async def run(self, interval=JOBSTORE_FLUSH_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
@@ -0,0 +1,181 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+"""
+Duration and frame size straight from container headers, with a handful of
+small seeks and reads. MP4/MOV: moov > mvhd for the duration, the first
+video trak's tkhd for the size. MKV/WebM: Segment > Info for the duration,
+Tracks for the size, stopping at the first Cluster. Only the header has to
+be on disk, so a file still downloading works as long as its header came
+first. Everything else returns None.
+"""
+
+import io
+import struct
+
+MKV_MAGIC = b'\x1a\x45\xdf\xa3'
+
+# EBML ids
+SEGMENT, CLUSTER, INFO, TRACKS = 0x18538067, 0x1F43B675, 0x1549A966, 0x1654AE6B
+TIMECODE_SCALE, DURATION = 0x2AD7B1, 0x4489
+TRACK_ENTRY, TRACK_TYPE, VIDEO, PIXEL_WIDTH, PIXEL_HEIGHT = 0xAE, 0x83, 0xE0, 0xB0, 0xBA
+
+
+def parse(path):
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(12)
+            if head[:4] == MKV_MAGIC:
+                return _mkv(f)
+            if head[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip'):
+                return _mp4(f)
+    # a truncated or corrupt header: let the caller fall back to ffprobe
+    except (OSError, ValueError, IndexError, struct.error):
+        pass
+    return None
+
+
+# ─── MP4 / MOV ───
+
+def _boxes(f, start, end):
+    pos = start
+    while end is None or pos + 8 <= end:
+        f.seek(pos)
+        hdr = f.read(8)
+        if len(hdr) < 8:
+            return
+        size, kind = struct.unpack('>I4s', hdr)
+        body = pos + 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            body += 8
+        elif size == 0:
+            f.seek(0, 2)
+            size = f.tell() - pos
+        if size < body - pos:
+            return
+        yield kind, body, pos + size
+        pos += size
+
+
+def _read(f, start, end, limit=4096):
+    f.seek(start)
+    return f.read(min(end - start, limit))
+
+
+def _mp4(f):
+    moov = next(((b, e) for k, b, e in _boxes(f, 0, None) if k == b'moov'), None)
+    if not moov:
+        return None
+    duration = width = height = 0
+    for kind, b, e in _boxes(f, *moov):
+        if kind == b'mvhd':
+            p = _read(f, b, e)
+            if p[:1] == b'\x01':
+                scale, dur = struct.unpack('>IQ', p[20:32])
+            else:
+                scale, dur = struct.unpack('>II', p[12:20])
+            duration = dur / scale if scale else 0
+        elif kind == b'trak' and not width:
+            tkhd, video = None, False
+            for k, tb, te in _boxes(f, b, e):
+                if k == b'tkhd':
+                    tkhd = _read(f, tb, te)
+                elif k == b'mdia':
+                    video = any(_read(f, hb, he)[8:12] == b'vide' for hk, hb, he in _boxes(f, tb, te) if hk == b'hdlr')
+            if video and tkhd and len(tkhd) >= 84:
+                # 16.16 fixed point, always the last eight bytes of the box
+                width, height = (v >> 16 for v in struct.unpack('>II', tkhd[-8:]))
+    if duration <= 0 or not width or not height:
+        return None
+    return {'width': width, 'height': height, 'duration': round(duration)}
+
+
+# ─── MKV / WebM ───
+
+def _vint(f, keep_marker=False):
+    first = f.read(1)
+    if not first:
+        raise ValueError('eof')
+    b = first[0]
+    n = 1
+    while n <= 8 and not b & (0x80 >> (n - 1)):
+        n += 1
+    if n > 8:
+        raise ValueError('bad vint')
+    rest = f.read(n - 1)
+    value = b if keep_marker else b & (0xFF >> n)
+    for c in rest:
+        value = (value << 8) | c
+    unknown = not keep_marker and value == (1 << (7 * n)) - 1
+    return value, unknown
+
+
+def _elements(f, start, end):
+    f.seek(start)
+    while end is None or f.tell() < end:
+        try:
+            eid, _ = _vint(f, keep_marker=True)
+            size, unknown = _vint(f)
+        except ValueError:
+            return
+        body = f.tell()
+        yield eid, body, None if unknown else body + size
+        if unknown:
+            return  # only the Segment has an unknown size here; its children follow directly
+        f.seek(body + size)
+
+
+def _children(data):
+    buf = io.BytesIO(data)
+    for eid, b, e in _elements(buf, 0, len(data)):
+        yield eid, data[b:e]
+
+
+def _uint(data):
+    return int.from_bytes(data, 'big')
+
+
+def _mkv(f):
+    f.seek(0)
+    header = next(_elements(f, 0, None), None)
+    if not header or header[2] is None:
+        return None
+    segment = next(((b, e) for eid, b, e in _elements(f, header[2], None) if eid == SEGMENT), None)
+    if not segment:
+        return None
+    scale, duration, width, height = 1000000, 0, 0, 0
+    start, end = segment
+    info = tracks = None
+    for eid, b, e in _elements(f, start, end):
+        if eid == CLUSTER or e is None:
+            break
+        if eid in (INFO, TRACKS) and e - b <= 1 << 20:
+            pos = f.tell()
+            f.seek(b)
+            data = f.read(e - b)
+            f.seek(pos)
+            if eid == INFO:
+                info = data
+            else:
+                tracks = data
+        if info and tracks:
+            break
+    for eid, data in _children(info or b''):
+        if eid == TIMECODE_SCALE:
+            scale = _uint(data)
+        elif eid == DURATION:
+            duration = struct.unpack('>f' if len(data) == 4 else '>d', data)[0]
+    for eid, entry in _children(tracks or b''):
+        if eid != TRACK_ENTRY:
+            continue
+        fields = dict(_children(entry))
+        if _uint(fields.get(TRACK_TYPE, b'')) == 1 and VIDEO in fields:
+            video = dict(_children(fields[VIDEO]))
+            width, height = _uint(video.get(PIXEL_WIDTH, b'')), _uint(video.get(PIXEL_HEIGHT, b''))
+            break
+    seconds = duration * scale / 1e9
+    if seconds <= 0 or not width or not height:
+        return None
+    return {'width': width, 'height': height, 'duration': round(seconds)}
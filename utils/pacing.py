@@ -0,0 +1,112 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import time
+import asyncio
+import inspect
+import logging
+from pyrogram.errors import FloodWait
+from config import PACE_MIN_DELAY, PACE_MAX_DELAY, FLOOD_RETRIES, TRANSFER_FLOOD_SLEEP
+
+logger = logging.getLogger(__name__)
+
+# (client name, method) -> monotonic time until which Telegram asked us to wait.
+# Shared by every pacer because the bot, userbot and user clients are shared too.
+FLOOD_UNTIL = {}
+
+# Progress edits are dropped instead of delayed while their method is throttled.
+DROPPABLE = {'edit_message_text'}
+
+# Calls that move a whole file. Retrying one would transfer every part again, so they
+# are never retried here; pyrogram sleeps out the wait around the one RPC that hit it.
+TRANSFERS = {
+    'send_video', 'send_document', 'send_audio', 'send_photo', 'send_voice', 'send_video_note',
+    'send_animation', 'send_media_group', 'download_media', 'save_file', 'stream_media',
+}
+
+
+def client_key(client):
+    return getattr(client, 'name', None) or str(id(client))
+
+
+class Pacer:
+    """
+    Adaptive pacing for one job. The delay between items starts at
+    PACE_MIN_DELAY, grows when Telegram answers with FloodWait and decays back
+    after clean items; cheap calls hitting a FloodWait sleep for `.value` and
+    retry, file transfers leave the wait to the RPC layer (see TRANSFERS).
+    """
+
+    def __init__(self, min_delay=PACE_MIN_DELAY, max_delay=PACE_MAX_DELAY):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = min_delay
+        self.floods = {}
+        self._flooded = False
+
+    def wrap(self, client):
+        if client is None or isinstance(client, Paced):
+            return client
+        return Paced(client, self)
+
+    def _record(self, key, value):
+        FLOOD_UNTIL[key] = max(FLOOD_UNTIL.get(key, 0), time.monotonic() + value)
+        _, count = self.floods.get(key, (0, 0))
+        self.floods[key] = (value, count + 1)
+        self._flooded = True
+        self.delay = min(self.max_delay, max(self.delay * 2, value / 10, self.min_delay))
+        logger.warning(f"FloodWait {value}s on {key[1]} ({key[0]})")
+
+    async def call(self, client, method, fn, *args, **kwargs):
+        key = (client_key(client), method)
+        if method in TRANSFERS and getattr(client, 'sleep_threshold', None) is not None:
+            client.sleep_threshold = max(client.sleep_threshold, TRANSFER_FLOOD_SLEEP)
+        for attempt in range(FLOOD_RETRIES + 1):
+            wait = FLOOD_UNTIL.get(key, 0) - time.monotonic()
+            if wait > 0:
+                if method in DROPPABLE:
+                    return None
+                await asyncio.sleep(wait)
+            try:
+                return await fn(*args, **kwargs)
+            except FloodWait as e:
+                self._record(key, e.value)
+                if method in DROPPABLE:
+                    return None  # a status edit isn't worth failing the item over
+                if method in TRANSFERS or attempt == FLOOD_RETRIES:
+                    raise
+
+    async def step(self):
+        """Sleep between items, then relax the delay if the last item went through cleanly."""
+        await asyncio.sleep(self.delay)
+        if not self._flooded:
+            self.delay = max(self.min_delay, self.delay * 0.8)
+        self._flooded = False
+
+    def state(self):
+        now = time.monotonic()
+        parts = [f'⏱ Delay: {self.delay:.1f}s']
+        for (name, method), (value, count) in self.floods.items():
+            left = FLOOD_UNTIL.get((name, method), 0) - now
+            parts.append(f'🐢 {method}: {value}s x{count}' + (f' ({left:.0f}s left)' if left > 0 else ''))
+        return '\n'.join(parts)
+
+
+class Paced:
+    """Client proxy that sends every coroutine method through a Pacer."""
+
+    def __init__(self, client, pacer):
+        self.client = client
+        self.pacer = pacer
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        # pyrogram's sync wrappers hide the coroutine function behind __wrapped__
+        if not callable(attr) or not inspect.iscoroutinefunction(inspect.unwrap(attr)):
+            return attr
+
+        async def paced(*args, **kwargs):
+            return await self.pacer.call(self.client, name, attr, *args, **kwargs)
+
+        return paced
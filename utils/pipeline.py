@@ -0,0 +1,103 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import time
+import asyncio
+from config import BATCH_PIPELINE_DEPTH
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.bytes = 0
+
+    def add_bytes(self, n):
+        self.bytes += n or 0
+
+    def rate(self):
+        if not self.busy:
+            return '-'
+        if self.bytes:
+            return f'{self.bytes / self.busy / (1024 * 1024):.2f} MB/s'
+        return f'{self.items / self.busy * 60:.1f}/min'
+
+
+class Pipeline:
+    """
+    Runs items through named stages, one worker per stage, with bounded
+    queues of `depth` items between them. Items reach the sink in source order.
+    Time spent pulling from the source is reported under the `source` name.
+    A stage returning None drops the item; a stage raising passes the
+    exception on to the sink instead of a value.
+    """
+
+    def __init__(self, stages, depth=BATCH_PIPELINE_DEPTH, source='source'):
+        self.stages = stages
+        self.depth = max(1, depth)
+        self.source = source
+        self.stats = {name: StageStats(name) for name in [source] + [name for name, _ in stages]}
+
+    def summary(self):
+        return ' · '.join(f'{s.name}: {s.rate()}' for s in self.stats.values())
+
+    async def _feed(self, source, q):
+        st = self.stats[self.source]
+        it = source.__aiter__()
+        idx = 0
+        while True:
+            t0 = time.monotonic()
+            try:
+                item = await it.__anext__()
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                await q.put((idx, e))
+                break
+            st.busy += time.monotonic() - t0
+            st.items += 1
+            await q.put((idx, item))
+            idx += 1
+        await q.put(_DONE)
+
+    async def _worker(self, name, fn, q_in, q_out):
+        st = self.stats[name]
+        while True:
+            item = await q_in.get()
+            if item is _DONE:
+                await q_out.put(_DONE)
+                return
+            idx, val = item
+            if val is not None and not isinstance(val, Exception):
+                t0 = time.monotonic()
+                try:
+                    val = await fn(val)
+                except Exception as e:
+                    val = e
+                st.busy += time.monotonic() - t0
+                st.items += 1
+            await q_out.put((idx, val))
+
+    async def run(self, source, sink):
+        """Feed `source` through the stages; stop early if `sink(idx, value)` returns False."""
+        qs = [asyncio.Queue(self.depth) for _ in range(len(self.stages) + 1)]
+        tasks = [asyncio.create_task(self._feed(source, qs[0]))]
+        tasks += [
+            asyncio.create_task(self._worker(name, fn, qs[k], qs[k + 1]))
+            for k, (name, fn) in enumerate(self.stages)
+        ]
+        try:
+            while True:
+                item = await qs[-1].get()
+                if item is _DONE:
+                    break
+                if await sink(*item) is False:
+                    break
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
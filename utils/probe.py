@@ -0,0 +1,90 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import PROBE_WORKERS, PROBE_CACHE_SIZE
+from utils.mediainfo import parse
+from utils.ffmpeg import FFMPEG
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METADATA = {'width': 1, 'height': 1, 'duration': 1}
+
+
+class ProbeService:
+    """
+    Video metadata for the whole process: container headers are read by
+    utils.mediainfo on one fixed pool of `workers` threads, and anything it
+    can't read goes to ffprobe through the shared ffmpeg pool. Results sit
+    in an LRU keyed by the source file_unique_id when known or else by
+    (path, size, mtime), and there is one probe per key however many
+    callers ask for it at once. Failed probes return DEFAULT_METADATA and
+    are not cached.
+    """
+
+    def __init__(self, workers=PROBE_WORKERS, cache_size=PROBE_CACHE_SIZE):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='probe')
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self._inflight = {}
+        self.pending = 0  # submitted, not finished
+        self.probes = self.hits = self.fallbacks = 0
+        self.latency = 0.0  # seconds spent probing, for the average
+
+    def _key(self, path, unique_id=None):
+        if unique_id:
+            return 'uid', unique_id
+        st = os.stat(path)
+        return 'file', os.path.realpath(path), st.st_size, st.st_mtime_ns
+
+    async def probe(self, path, unique_id=None):
+        try:
+            key = self._key(path, unique_id)
+        except OSError as e:
+            logger.error(f"Cannot probe {path}: {e}")
+            return dict(DEFAULT_METADATA)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return dict(self.cache[key])
+        task = self._inflight.get(key)
+        if not task:
+            task = self._inflight[key] = asyncio.create_task(self._run(key, path))
+        return dict(await asyncio.shield(task))
+
+    async def _run(self, key, path):
+        self.pending += 1
+        st = time.monotonic()
+        try:
+            meta = await asyncio.get_running_loop().run_in_executor(self.pool, parse, path)
+            if not meta:
+                self.fallbacks += 1
+                meta = await FFMPEG.probe(path)
+        except Exception as e:
+            logger.error(f"Error in video_metadata: {e}")
+            meta = None
+        finally:
+            self.pending -= 1
+            self.probes += 1
+            self.latency += time.monotonic() - st
+            self._inflight.pop(key, None)
+        if not meta:
+            return DEFAULT_METADATA
+        self.cache[key] = meta
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return meta
+
+    def state(self):
+        avg = self.latency / self.probes * 1000 if self.probes else 0
+        return f'🎞 probes: {self.pending} queued/running on {self.workers} · {self.probes} done · {self.hits} cached · {self.fallbacks} via ffprobe · {avg:.0f} ms avg'
+
+
+PROBE = ProbeService()
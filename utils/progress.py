@@ -0,0 +1,72 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import time
+import asyncio
+import logging
+from config import PROGRESS_EDITS_PER_SEC, PROGRESS_CHAT_INTERVAL
+from utils.pacing import client_key
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressEditor:
+    """
+    Single owner of progress edits. Transfer callbacks only hand over the
+    latest text for a status message; a background task sends at most
+    `rate` edits per second overall and one per `chat_interval` seconds per
+    chat, always with the newest text. Edits run as their own tasks and a
+    failed one is simply dropped.
+    """
+
+    def __init__(self, rate=PROGRESS_EDITS_PER_SEC, chat_interval=PROGRESS_CHAT_INTERVAL):
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.pending = {}  # (client key, chat, message id) -> (client, text)
+        self._last = {}  # (client key, chat) -> monotonic time of the last edit
+        self._edits = set()
+        self._task = None
+        self.sent = self.failed = 0
+
+    def update(self, client, chat_id, message_id, text):
+        self.pending[(client_key(client), chat_id, message_id)] = (client, text)
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def discard(self, client, chat_id, message_id):
+        # call before reusing a status message for something else, so a late flush can't overwrite it
+        self.pending.pop((client_key(client), chat_id, message_id), None)
+
+    async def _edit(self, client, chat_id, message_id, text):
+        try:
+            await client.edit_message_text(chat_id, message_id, text)
+            self.sent += 1
+        except Exception as e:
+            self.failed += 1
+            logger.debug(f"Dropped progress edit for {chat_id}/{message_id}: {e}")
+
+    async def _run(self):
+        while self.pending:
+            now = time.monotonic()
+            ready = [k for k in self.pending if now - self._last.get(k[:2], 0) >= self.chat_interval]
+            if not ready:
+                wait = min(self._last[k[:2]] + self.chat_interval for k in self.pending) - now
+                await asyncio.sleep(max(wait, 0.05))
+                continue
+            # the chat that has waited longest goes first
+            key = min(ready, key=lambda k: self._last.get(k[:2], 0))
+            client, text = self.pending.pop(key)
+            self._last[key[:2]] = now
+            task = asyncio.create_task(self._edit(client, key[1], key[2], text))
+            self._edits.add(task)
+            task.add_done_callback(self._edits.discard)
+            await asyncio.sleep(1 / self.rate)
+        cutoff = time.monotonic() - self.chat_interval
+        self._last = {k: t for k, t in self._last.items() if t > cutoff}
+
+    def state(self):
+        return f'✏️ progress: {len(self.pending)} pending · {self.sent} sent · {self.failed} dropped'
+
+
+PROGRESS = ProgressEditor()
@@ -0,0 +1,96 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from config import MAX_DOWNLOADS, MAX_UPLOADS, MAX_INFLIGHT_MB, PREMIUM_WEIGHT
+
+
+class FairScheduler:
+    """
+    Process-wide admission for transfers. Each kind ('download', 'upload')
+    has its own slot cap and all kinds share one in-flight byte budget.
+    Waiters are ordered by weighted fair queuing over flows (one flow per
+    user job), so a long batch and a fresh /single job take turns, and
+    premium flows get PREMIUM_WEIGHT times the share of a free one.
+    """
+
+    def __init__(self, limits=None, max_bytes=MAX_INFLIGHT_MB * 1024 * 1024):
+        self.limits = limits or {'download': MAX_DOWNLOADS, 'upload': MAX_UPLOADS}
+        self.max_bytes = max_bytes
+        self.active = {kind: 0 for kind in self.limits}
+        self.bytes = 0
+        self.weights = {}
+        self._finish = {}
+        self._vtime = {kind: 0.0 for kind in self.limits}
+        self._queues = {kind: [] for kind in self.limits}
+        self._seq = itertools.count()
+
+    def register(self, flow, premium=False):
+        self.weights[flow] = PREMIUM_WEIGHT if premium else 1
+
+    def unregister(self, flow):
+        self.weights.pop(flow, None)
+        for kind in self.limits:
+            self._finish.pop((kind, flow), None)
+
+    def _admissible(self, kind, size):
+        if self.active[kind] >= self.limits[kind]:
+            return False
+        # a file bigger than the whole budget still runs, just alone
+        return self.bytes + size <= self.max_bytes or self.bytes == 0
+
+    def _dispatch(self):
+        for kind, queue in self._queues.items():
+            while queue:
+                tag, _, fut, size = queue[0]
+                if fut.done():
+                    heapq.heappop(queue)
+                    continue
+                if not self._admissible(kind, size):
+                    break
+                heapq.heappop(queue)
+                self._vtime[kind] = tag
+                self.active[kind] += 1
+                self.bytes += size
+                fut.set_result(None)
+
+    async def acquire(self, kind, flow, size=0):
+        weight = self.weights.get(flow, 1)
+        start = max(self._vtime[kind], self._finish.get((kind, flow), 0.0))
+        tag = start + 1 / weight
+        self._finish[(kind, flow)] = tag
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues[kind], (tag, next(self._seq), fut, size))
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(kind, size)
+            raise
+
+    def release(self, kind, size=0):
+        self.active[kind] -= 1
+        self.bytes -= size
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, kind, flow, size=0):
+        await self.acquire(kind, flow, size)
+        try:
+            yield
+        finally:
+            self.release(kind, size)
+
+    def state(self):
+        waiting = {kind: sum(not w[2].done() for w in q) for kind, q in self._queues.items()}
+        return ' · '.join(
+            f'{kind}: {self.active[kind]}/{self.limits[kind]} (+{waiting[kind]} queued)' for kind in self.limits
+        ) + f' · {self.bytes / (1024 * 1024):.0f}/{self.max_bytes / (1024 * 1024):.0f} MB'
+
+
+SCHED = FairScheduler()
@@ -0,0 +1,272 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import os
+import math
+import asyncio
+import logging
+import mimetypes
+from pyrogram import raw, types, utils
+from pyrogram.file_id import FileId
+from pyrogram.session import Auth, Session
+from config import RELAY_BUFFER_MB, RELAY_UPLOAD_WORKERS, DOWNLOAD_CONNECTIONS, UPLOAD_CONNECTIONS, TRANSFER_FLOOD_SLEEP
+from utils.pacing import Paced, client_key
+
+logger = logging.getLogger(__name__)
+
+PART_SIZE = 512 * 1024  # largest part upload.SaveBigFilePart accepts
+
+
+async def relay_upload(dst, src, message, size, progress=None, progress_args=()):
+    """
+    Upload the media of `message` through `dst` while `src` is still
+    streaming it, holding at most RELAY_BUFFER_MB in memory. Returns the
+    InputFileBig to send; `size` must be the exact source file size.
+    """
+    file_id = dst.rnd_id()
+    total_parts = math.ceil(size / PART_SIZE)
+    queue = asyncio.Queue(max(1, RELAY_BUFFER_MB * 1024 * 1024 // PART_SIZE))
+    done = 0
+
+    async def produce():
+        buf = bytearray()
+        part = 0
+        async for chunk in src.stream_media(message):
+            buf += chunk
+            while len(buf) >= PART_SIZE:
+                await queue.put((part, bytes(buf[:PART_SIZE])))
+                del buf[:PART_SIZE]
+                part += 1
+        if buf:
+            await queue.put((part, bytes(buf)))
+            part += 1
+        if part != total_parts:
+            raise ValueError(f"Streamed {part} parts, expected {total_parts}")
+        for _ in range(RELAY_UPLOAD_WORKERS):
+            await queue.put(None)
+
+    async def consume():
+        nonlocal done
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            part, data = item
+            await dst.invoke(raw.functions.upload.SaveBigFilePart(
+                file_id=file_id, file_part=part, file_total_parts=total_parts, bytes=data
+            ), sleep_threshold=TRANSFER_FLOOD_SLEEP)
+            done += len(data)
+            if progress:
+                await progress(done, size, *progress_args)
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(consume()) for _ in range(RELAY_UPLOAD_WORKERS)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for t in tasks:
+            t.cancel()
+    return raw.types.InputFileBig(id=file_id, parts=total_parts, name="file")
+
+
+async def send_uploaded(client, chat_id, input_file, kind, file_name, caption=None, thumb=None,
+                        duration=0, width=0, height=0, performer=None, title=None, reply_to_message_id=None):
+    """Send an already uploaded InputFile as `kind` ('video', 'audio' or 'document')."""
+    mime_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    attributes = [raw.types.DocumentAttributeFilename(file_name=file_name)]
+    if kind == 'video':
+        attributes.insert(0, raw.types.DocumentAttributeVideo(
+            duration=duration or 0, w=width or 0, h=height or 0, supports_streaming=True
+        ))
+    elif kind == 'audio':
+        attributes.insert(0, raw.types.DocumentAttributeAudio(
+            duration=duration or 0, performer=performer, title=title
+        ))
+    media = raw.types.InputMediaUploadedDocument(
+        file=input_file,
+        mime_type=mime_type,
+        attributes=attributes,
+        thumb=await client.save_file(thumb) if thumb else None,
+        force_file=True if kind == 'document' else None,
+    )
+    r = await client.invoke(raw.functions.messages.SendMedia(
+        peer=await client.resolve_peer(chat_id),
+        media=media,
+        random_id=client.rnd_id(),
+        reply_to_msg_id=reply_to_message_id,
+        **await utils.parse_text_entities(client, caption or "", None, None)
+    ))
+    for update in r.updates:
+        if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+            return await types.Message._parse(
+                client, update.message,
+                {u.id: u for u in r.users},
+                {c.id: c for c in r.chats}
+            )
+
+
+CHUNK_SIZE = 1024 * 1024  # largest limit upload.GetFile accepts
+_SESSIONS = {}  # (client key, dc id) -> media sessions kept for reuse
+_SESSION_LOCKS = {}  # (client key, dc id) -> lock held while that pool grows
+
+
+async def media_sessions(client, dc_id, count):
+    """Open (or reuse) `count` media sessions of `client` to `dc_id`."""
+    key = (client_key(client), dc_id)
+    # album parts download side by side; the first one grows the pool, the rest reuse it
+    async with _SESSION_LOCKS.setdefault(key, asyncio.Lock()):
+        pool = _SESSIONS.setdefault(key, [])
+        test_mode = await client.storage.test_mode()
+        while len(pool) < count:
+            home = dc_id == await client.storage.dc_id()
+            if home:
+                auth_key = await client.storage.auth_key()
+            elif pool:
+                auth_key = pool[0].auth_key  # authorization was already imported for this key
+            else:
+                auth_key = await Auth(client, dc_id, test_mode).create()
+            session = Session(client, dc_id, auth_key, test_mode, is_media=True)
+            await session.start()
+            if not home and not pool:
+                exported = await client.invoke(raw.functions.auth.ExportAuthorization(dc_id=dc_id))
+                await session.invoke(raw.functions.auth.ImportAuthorization(id=exported.id, bytes=exported.bytes))
+            pool.append(session)
+        return pool[:count]
+
+
+async def close_sessions(client):
+    for key in [k for k in _SESSIONS if k[0] == client_key(client)]:
+        _SESSION_LOCKS.pop(key, None)
+        for session in _SESSIONS.pop(key):
+            try:
+                await session.stop()
+            except Exception as e:
+                logger.warning(f"Error closing media session: {e}")
+
+
+async def fetch_ranges(sessions, request, size, path, progress=None, progress_args=()):
+    """
+    Fetch `size` bytes into a preallocated file at `path`, one worker per
+    session. Workers take the next CHUNK_SIZE range as they free up, so a
+    slow connection never holds back the rest; `request(offset, limit)`
+    builds the call each session invokes.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.ftruncate(fd, size)
+    ranges = iter(range(0, size, CHUNK_SIZE))
+    done = 0
+
+    async def worker(session):
+        nonlocal done
+        for offset in ranges:
+            # a FloodWait on one part is slept out and that part retried, not the whole file
+            r = await session.invoke(request(offset, CHUNK_SIZE), sleep_threshold=TRANSFER_FLOOD_SLEEP)
+            data = getattr(r, 'bytes', None)
+            if data is None:
+                raise ValueError(f"Unexpected {type(r).__name__} at offset {offset}")
+            if len(data) != min(CHUNK_SIZE, size - offset):
+                raise ValueError(f"Short read at offset {offset}: {len(data)} bytes")
+            await asyncio.to_thread(os.pwrite, fd, data, offset)
+            done += len(data)
+            if progress:
+                await progress(done, size, *progress_args)
+
+    tasks = [asyncio.create_task(worker(s)) for s in sessions]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        os.close(fd)
+        os.remove(path)
+        raise
+    os.close(fd)
+    return path
+
+
+async def parallel_download(client, message, path, size, connections=DOWNLOAD_CONNECTIONS,
+                            progress=None, progress_args=()):
+    """
+    Download the document-like media of `message` to `path` over
+    `connections` media sessions to the file's DC. Falls back to the
+    client's own download_media when a range comes back short or as a
+    CDN redirect.
+    """
+    media = next(getattr(message, k) for k in ('video', 'audio', 'document', 'animation', 'voice', 'video_note')
+                 if getattr(message, k, None))
+    file_id = FileId.decode(media.file_id)
+    location = raw.types.InputDocumentFileLocation(
+        id=file_id.media_id, access_hash=file_id.access_hash,
+        file_reference=file_id.file_reference, thumb_size=file_id.thumbnail_size
+    )
+    # sessions talk to Telegram directly, so they need the bare client under a Paced proxy
+    sessions = await media_sessions(client.client if isinstance(client, Paced) else client,
+                                    file_id.dc_id, max(1, connections))
+    try:
+        return await fetch_ranges(
+            sessions, lambda offset, limit: raw.functions.upload.GetFile(location=location, offset=offset, limit=limit),
+            size, path, progress, progress_args
+        )
+    except ValueError as e:
+        logger.warning(f"Parallel download failed ({e}), retrying with a single connection")
+        return await client.download_media(message, file_name=path, progress=progress, progress_args=progress_args)
+
+
+async def parallel_save_file(client, path, connections=UPLOAD_CONNECTIONS, progress=None, progress_args=()):
+    """
+    Upload the file at `path` as SaveBigFilePart parts spread over
+    `connections` media sessions to the home DC. Returns the InputFileBig
+    for the send call.
+    """
+    size = os.path.getsize(path)
+    file_id = client.rnd_id()
+    total_parts = math.ceil(size / PART_SIZE)
+    sessions = await media_sessions(client, await client.storage.dc_id(), max(1, connections))
+    parts = iter(range(total_parts))
+    done = 0
+
+    def read(part):
+        with open(path, 'rb') as f:
+            f.seek(part * PART_SIZE)
+            return f.read(PART_SIZE)
+
+    async def worker(session):
+        nonlocal done
+        for part in parts:
+            data = await asyncio.to_thread(read, part)
+            await session.invoke(raw.functions.upload.SaveBigFilePart(
+                file_id=file_id, file_part=part, file_total_parts=total_parts, bytes=data
+            ), sleep_threshold=TRANSFER_FLOOD_SLEEP)
+            done += len(data)
+            if progress:
+                await progress(done, size, *progress_args)
+
+    tasks = [asyncio.create_task(worker(s)) for s in sessions]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return raw.types.InputFileBig(id=file_id, parts=total_parts, name=os.path.basename(path))
+
+
+def use_parallel_upload(client, connections=UPLOAD_CONNECTIONS):
+    """
+    Route the big-file uploads of `client`'s send_* calls through
+    parallel_save_file. Small files, streams and part retries after
+    FilePartMissing keep Pyrogram's own save_file.
+    """
+    if connections <= 1:
+        return client
+    save_file = client.save_file
+
+    async def save(path, file_id=None, file_part=0, progress=None, progress_args=()):
+        if file_id is None and isinstance(path, str) and os.path.getsize(path) > 10 * 1024 * 1024:
+            return await parallel_save_file(client, path, connections, progress, progress_args)
+        return await save_file(path, file_id=file_id, file_part=file_part, progress=progress, progress_args=progress_args)
+
+    client.save_file = save
+    return client
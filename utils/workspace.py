@@ -0,0 +1,163 @@
+# Copyright (c) 2025 devgagan : https://github.com/devgaganin.
+# Licensed under the GNU General Public License v3.0.
+# See LICENSE file in the repository root for full license text.
+
+import os
+import re
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+from config import WORK_DIR, WORK_QUOTA_GB, WORK_MIN_FREE_MB, WORK_WAIT
+
+logger = logging.getLogger(__name__)
+
+# the directories `open` creates; WORK_DIR may be a shared /tmp, so nothing else there is ours
+WORKSPACE_DIR = re.compile(r'^ws-.+-[0-9a-f]{8}$')
+
+
+class WorkspaceFull(Exception):
+    pass
+
+
+class Workspace:
+    """One job's directory under the root, plus the bytes it has been admitted for."""
+
+    def __init__(self, manager, owner, path):
+        self.manager = manager
+        self.owner = owner
+        self.dir = path
+        self.held = 0
+
+    def path(self, *parts):
+        path = os.path.join(self.dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    async def admit(self, size):
+        await self.manager.admit(self, size)
+        return size
+
+    def release(self, size):
+        size = min(size or 0, self.held)
+        self.held -= size
+        self.manager.reserved -= size
+        self.manager.freed.set()
+
+    def close(self):
+        self.release(self.held)
+        shutil.rmtree(self.dir, ignore_errors=True)
+        if self.manager.spaces.get(self.owner) is self:
+            del self.manager.spaces[self.owner]
+
+
+class WorkspaceManager:
+    """
+    Downloads land in a per-job directory under `root` (a tmpfs or fast
+    volume if WORK_DIR points there) that is removed with everything in it
+    when the job ends, however it ends. Before a download starts it is
+    admitted against free space, keeping `headroom` bytes free, and against
+    the global `quota` on bytes held by all jobs; when it doesn't fit yet it
+    waits up to `wait` seconds for other jobs to release space.
+    """
+
+    def __init__(self, root=WORK_DIR, quota=WORK_QUOTA_GB * 1024 ** 3, headroom=WORK_MIN_FREE_MB * 1024 ** 2, wait=WORK_WAIT):
+        self.root = os.path.abspath(root)
+        self.quota = int(quota)
+        self.headroom = headroom
+        self.wait = wait
+        self.reserved = 0
+        self.spaces = {}  # owner -> open Workspace
+        self.freed = asyncio.Event()
+        self.rejected = 0
+
+    def open(self, owner=None):
+        """A new workspace; one with an owner is also what `get(owner)` returns until closed."""
+        path = os.path.join(self.root, f'ws-{owner if owner is not None else "tmp"}-{uuid.uuid4().hex[:8]}')
+        os.makedirs(path, exist_ok=True)
+        ws = Workspace(self, owner, path)
+        if owner is not None:
+            self.spaces[owner] = ws
+        return ws
+
+    def get(self, owner):
+        return self.spaces.get(owner) or self.open(owner)
+
+    def close(self, owner):
+        ws = self.spaces.get(owner)
+        if ws:
+            ws.close()
+
+    def release(self, owner, size):
+        ws = self.spaces.get(owner)
+        if ws:
+            ws.release(size)
+
+    def _on_disk(self):
+        # allocated blocks, not st_size: parallel downloads preallocate a sparse file of the full size
+        total = 0
+        for base, _, files in os.walk(self.root):
+            for name in files:
+                try:
+                    st = os.stat(os.path.join(base, name))
+                except OSError:
+                    continue
+                total += st.st_blocks * 512 if hasattr(st, 'st_blocks') else st.st_size
+        return total
+
+    async def _shortfall(self, size):
+        """Why `size` more bytes can't be admitted right now, or None if they can."""
+        if self.quota and self.reserved + size > self.quota:
+            return f'quota {self.quota / 1024 ** 3:.1f} GB, {self.reserved / 1024 ** 3:.2f} GB held'
+        free = shutil.disk_usage(self.root).free
+        pending = max(0, self.reserved - await asyncio.to_thread(self._on_disk))  # admitted but not written yet
+        if free - pending < size + self.headroom:
+            return f'{max(0, free - pending) / 1024 ** 3:.2f} GB free'
+        return None
+
+    async def admit(self, ws, size):
+        size = size or 0
+        if self.quota and size > self.quota:
+            self.rejected += 1
+            raise WorkspaceFull(f'{size / 1024 ** 3:.2f} GB is over the {self.quota / 1024 ** 3:.1f} GB quota')
+        deadline = time.monotonic() + self.wait
+        while (why := await self._shortfall(size)):
+            left = deadline - time.monotonic()
+            # with nothing held by any job, no release is coming
+            if left <= 0 or not self.reserved:
+                self.rejected += 1
+                raise WorkspaceFull(f'no room for {size / 1024 ** 3:.2f} GB ({why})')
+            self.freed.clear()
+            try:
+                await asyncio.wait_for(self.freed.wait(), left)
+            except asyncio.TimeoutError:
+                pass
+        ws.held += size
+        self.reserved += size
+
+    def sweep(self):
+        """Remove what jobs of an earlier run left behind; call before any job starts."""
+        removed = 0
+        os.makedirs(self.root, exist_ok=True)
+        for entry in os.scandir(self.root):
+            if entry.is_dir(follow_symlinks=False) and WORKSPACE_DIR.match(entry.name):
+                removed += self._sweep(shutil.rmtree, entry.path)
+        if removed:
+            logger.info(f"Workspace sweep removed {removed} leftover entries")
+        return removed
+
+    def _sweep(self, remove, path):
+        try:
+            remove(path)
+            return 1
+        except OSError as e:
+            logger.warning(f"Workspace sweep could not remove {path}: {e}")
+            return 0
+
+    def state(self):
+        quota = f'/{self.quota / 1024 ** 3:.0f}' if self.quota else ''
+        return f'💾 disk: {len(self.spaces)} workspaces · {self.reserved / 1024 ** 3:.2f}{quota} GB held'
+
+
+WORKSPACE = WorkspaceManager()